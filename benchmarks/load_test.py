@@ -0,0 +1,360 @@
+"""
+Capacity test: N simulated analysts driving the real Streamlit app in one process.
+
+    python benchmarks/load_test.py --sessions 1,2,4,8,16
+
+Each session is a streamlit AppTest running main.py through
+setup -> evaluate -> results -> PDF -> chat -> IP Score (view + submit).
+Google Patents and OpenAI are replaced by local stand-ins with configurable latency
+(IP_EVAL_PATENTS_BASE_URL and OPENAI_BASE_URL), so runs are free and repeatable.
+Every session uses its own patent numbers so the scrape, digest and PDF caches behave as
+they would for distinct analysts.
+
+Reported per concurrency level: per-step latency percentiles, end-to-end throughput,
+resident memory per session, and the level at which the process saturates
+(throughput stops scaling or p95 latency more than doubles).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STEPS = ("setup", "evaluate", "results", "pdf", "chat", "ip_score", "ip_score_submit")
+
+# --- Local stand-ins -------------------------------------------------------------------
+
+def _patent_page(number, paragraphs):
+    claims = "".join(
+        f'<claim num="{i}"><div class="claim-text">{i}. A battery cell of claim {max(1, i - 1)} wherein '
+        f'the electrolyte comprises lithium salt number {i} at {i * 3} percent by weight.</div></claim>'
+        for i in range(1, 21)
+    )
+    description = "".join(
+        f'<div class="description-paragraph">[{i:04d}] The anode layer {i} is coated with a ceramic '
+        f'separator of thickness {i % 50} micrometres, improving cycle life at high temperature.</div>'
+        for i in range(paragraphs)
+    )
+    return f"""<html><body>
+<h1 itemprop="pageTitle">{number} - Solid-state battery cell {number} - Google Patents</h1>
+<section itemprop="abstract"><div class="abstract">A solid-state battery cell with a ceramic separator ({number}).</div></section>
+<ul>
+<li itemprop="classifications"><span itemprop="Code">H01M</span><span itemprop="Description">Batteries</span></li>
+<li itemprop="classifications"><span itemprop="Code">H01M10/0562</span><span itemprop="Description">Solid electrolytes</span></li>
+</ul>
+<section itemprop="claims">{claims}</section>
+<dl>
+<dd itemprop="publicationNumber">{number}</dd>
+<dd itemprop="countryName">United States</dd>
+<dd itemprop="inventor">Ada Load</dd>
+<dd itemprop="assigneeCurrent">Load Test Corp</dd>
+<dd itemprop="events"><time itemprop="date">2015-03-01</time><span itemprop="title">Priority</span><span itemprop="type">priority</span></dd>
+<dd itemprop="events"><time itemprop="date">2018-06-12</time><span itemprop="title">Granted</span><span itemprop="type">granted</span></dd>
+</dl>
+<span itemprop="status">Active</span>
+<section itemprop="description">{description}</section>
+</body></html>"""
+
+def _evaluation_text():
+    return (
+        "### 1. Technology Overview\n* **Background & Context:** Solid-state cells.\n"
+        "### 2. Market & Commercial Analysis\n* **Target Market(s) & Segmentation:** EVs.\n"
+        "### 3. Further Exploration\n* **Questions for Inventors:** Cycle life?\n"
+    )
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.requests = 0
+
+    def enter(self):
+        with self.lock:
+            self.active += 1
+            self.requests += 1
+            self.peak = max(self.peak, self.active)
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+def _start_server(handler_class):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def start_patents_stub(latency, paragraphs, stats):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            stats.enter()
+            try:
+                time.sleep(latency)
+                number = self.path.rstrip('/').split('/')[-1]
+                body = _patent_page(number, paragraphs).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                stats.leave()
+
+        def log_message(self, format, *args):
+            pass
+
+    return _start_server(Handler)
+
+def start_openai_stub(base_latency, latency_per_10k_chars, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            stats.enter()
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                prompt = "\n".join(m.get("content") or "" for m in request.get("messages", []))
+                prompt_chars = len(prompt)
+                time.sleep(base_latency + latency_per_10k_chars * prompt_chars / 10000)
+
+                response_format = request.get("response_format") or {}
+                if response_format.get("type") == "json_schema":
+                    schema = response_format["json_schema"]["schema"]
+                    content = json.dumps({code: 3 for code in schema.get("properties", {})})
+                elif "### 1. Technology Overview" in prompt:
+                    content = _evaluation_text()
+                else:
+                    content = "Stand-in answer."
+
+                body = json.dumps({
+                    "id": "chatcmpl-loadtest",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4,
+                              "total_tokens": (prompt_chars + len(content)) // 4}
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                stats.leave()
+
+        def log_message(self, format, *args):
+            pass
+
+    return _start_server(Handler)
+
+# --- Sessions ----------------------------------------------------------------------------
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _timed(timings, step, action):
+    start = time.perf_counter()
+    at = action()
+    timings[step] = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f"{step}: {at.exception[0].message}")
+    return at
+
+def _share_runtime_across_threads():
+    """
+    AppTest installs a mock Runtime singleton for each run and clears it afterwards, which
+    breaks other runs in flight on other threads. Keep serving the last one instead.
+    """
+    from streamlit.runtime import Runtime
+
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+        runtime = cls._instance or last.get("runtime")
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return runtime
+
+    Runtime.instance = classmethod(instance)
+
+def run_session(session_id, timeout):
+    """
+    One analyst's full flow. Returns (step timings, AppTest) or raises on the first failing step.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    timings = {}
+    at = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=timeout)
+    # Set on the session rather than through at.secrets, which swaps the global st.secrets per run
+    at.session_state["api_key"] = "load-test"
+
+    _timed(timings, "setup", at.run)
+    main_input = next(t for t in at.text_input if t.label.startswith("Main Patent"))
+    main_input.set_value(f"US{90000000 + session_id}B2")
+    _timed(timings, "evaluate", lambda: next(b for b in at.button if b.label == "Evaluate IP").click().run())
+    if at.session_state["evaluation"] is None or str(at.session_state["evaluation"]).startswith("Error"):
+        raise RuntimeError(f"evaluate: {at.session_state['evaluation']}")
+
+    _timed(timings, "results", lambda: at.sidebar.radio[0].set_value("Evaluation Results").run())
+    _timed(timings, "pdf", lambda: next(b for b in at.button if b.label == "Prepare PDF Report").click().run())
+    _timed(timings, "chat", lambda: at.chat_input[0].set_value("What does claim 1 cover?").run())
+    _timed(timings, "ip_score", lambda: at.sidebar.radio[0].set_value("IP Score Matrix").run())
+    _timed(timings, "ip_score_submit", lambda: next(b for b in at.button if b.label == "Update Score Analysis").click().run())
+    return timings, at
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def run_level(sessions, first_id, timeout):
+    results = [None] * sessions
+    errors = []
+    rss_before = _rss_bytes()
+
+    def worker(i):
+        try:
+            results[i] = run_session(first_id + i, timeout)
+        except Exception as e:
+            errors.append(f"session {first_id + i}: {e}")
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    completed = [r for r in results if r is not None]
+    # Measured while the AppTests (and their session state) are still alive
+    rss_per_session = (_rss_bytes() - rss_before) / max(1, len(completed))
+
+    steps = {}
+    for step in STEPS:
+        values = [timings[step] for timings, _ in completed if step in timings]
+        steps[step] = {
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "max": max(values) if values else None
+        }
+    flow_times = [sum(timings.values()) for timings, _ in completed]
+    return {
+        "sessions": sessions,
+        "completed": len(completed),
+        "errors": errors,
+        "wall_seconds": wall,
+        "flows_per_minute": 60 * len(completed) / wall if wall else 0.0,
+        "flow_p50": statistics.median(flow_times) if flow_times else None,
+        "flow_p95": _percentile(flow_times, 95),
+        "rss_per_session_mb": rss_per_session / 1e6,
+        "steps": steps
+    }
+
+def find_saturation(levels, scaling_threshold=1.1, latency_factor=2.0):
+    """
+    First level whose throughput grew less than `scaling_threshold` over the previous level,
+    or whose p95 flow time exceeds `latency_factor` x the lowest level's.
+    """
+    if not levels:
+        return None
+    baseline = levels[0]["flow_p95"]
+    for previous, level in zip(levels, levels[1:]):
+        if level["flows_per_minute"] < previous["flows_per_minute"] * scaling_threshold:
+            return level["sessions"], "throughput stopped scaling"
+        if baseline and level["flow_p95"] and level["flow_p95"] > baseline * latency_factor:
+            return level["sessions"], f"p95 flow time above {latency_factor:g}x single-level baseline"
+    return None
+
+def _fmt(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+def print_report(levels, saturation, patents_stats, openai_stats):
+    print()
+    print(f"{'sessions':>8} {'done':>5} {'flows/min':>10} {'flow p50':>9} {'flow p95':>9} {'MB/session':>11}")
+    for level in levels:
+        print(f"{level['sessions']:>8} {level['completed']:>5} {level['flows_per_minute']:>10.1f} "
+              f"{level['flow_p50'] or 0:>8.2f}s {level['flow_p95'] or 0:>8.2f}s {level['rss_per_session_mb']:>11.1f}")
+    print()
+    print("Per-step latency in ms (p50 / p95 / max)")
+    print(f"{'step':>16} " + " ".join(f"{level['sessions']:>18}" for level in levels))
+    for step in STEPS:
+        cells = [f"{_fmt(l['steps'][step]['p50'])}/{_fmt(l['steps'][step]['p95'])}/{_fmt(l['steps'][step]['max'])}" for l in levels]
+        print(f"{step:>16} " + " ".join(f"{c:>18}" for c in cells))
+    print()
+    for level in levels:
+        for error in level["errors"][:5]:
+            print(f"error: {error}")
+    print(f"Stand-in requests: patents {patents_stats.requests} (peak {patents_stats.peak} concurrent), "
+          f"openai {openai_stats.requests} (peak {openai_stats.peak} concurrent)")
+    if saturation:
+        print(f"Saturation at {saturation[0]} sessions: {saturation[1]}")
+    else:
+        print("No saturation within the tested levels.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--sessions", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--patent-latency", type=float, default=0.3, help="Stand-in Google Patents latency (s)")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Stand-in OpenAI base latency per call (s)")
+    parser.add_argument("--llm-latency-per-10k", type=float, default=0.05, help="Extra stand-in latency per 10k prompt characters (s)")
+    parser.add_argument("--paragraphs", type=int, default=300, help="Description paragraphs per stand-in patent")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-step AppTest timeout (s)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    patents_stats, openai_stats = _Stats(), _Stats()
+    patents_server = start_patents_stub(args.patent_latency, args.paragraphs, patents_stats)
+    openai_server = start_openai_stub(args.llm_latency, args.llm_latency_per_10k, openai_stats)
+
+    # Must be set before the app's modules are imported (they read these at import time)
+    workdir = tempfile.mkdtemp(prefix="ip-eval-load-")
+    os.environ["IP_EVAL_PATENTS_BASE_URL"] = f"http://127.0.0.1:{patents_server.server_port}"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{openai_server.server_port}/v1"
+    os.environ["IP_EVAL_CORPUS_DIR"] = os.path.join(workdir, "corpus")
+    os.environ["IP_EVAL_SNAPSHOT_DIR"] = os.path.join(workdir, "snapshots")
+    # Simulated calls must not land in the real usage ledger or count towards its budgets
+    os.environ["IP_EVAL_USAGE_DB"] = os.path.join(workdir, "usage.sqlite3")
+    # Every simulated session comes from the same client IP, so they would share one user budget
+    os.environ["IP_EVAL_BUDGET_USER_DAILY_TOKENS"] = "0"
+    print(f"Stand-ins: patents {os.environ['IP_EVAL_PATENTS_BASE_URL']}, openai {os.environ['OPENAI_BASE_URL']}; data in {workdir}")
+
+    _share_runtime_across_threads()
+
+    # One untimed session first so imports and process-wide caches don't count against level 1
+    print("Warming up...", flush=True)
+    run_session(0, args.timeout)
+
+    levels = []
+    next_id = 1
+    for sessions in [int(n) for n in args.sessions.split(",") if n.strip()]:
+        print(f"Running {sessions} concurrent sessions...", flush=True)
+        levels.append(run_level(sessions, next_id, args.timeout))
+        next_id += sessions
+
+    saturation = find_saturation(levels)
+    print_report(levels, saturation, patents_stats, openai_stats)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"levels": levels, "saturation": saturation}, f, indent=2)
+    return 0 if all(not level["errors"] for level in levels) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
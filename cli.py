@@ -0,0 +1,127 @@
+"""
+Headless entry point for batch evaluations.
+
+    python cli.py run --publications pubs.txt --context context.json --output evaluations.jsonl [--pdf-dir reports] [--pack reports.zip]
+    python cli.py serve --context context.json [--port 8765] [--pdf-dir reports]
+    python cli.py usage [--by patent] [--days 7]
+"""
+import argparse
+import datetime
+import os
+import sys
+import tomllib
+import uuid
+
+from logic import batch
+from logic import usage
+
+def load_api_key():
+    """
+    Reads the OpenAI key from OPENAI_API_KEY, falling back to the same
+    .streamlit/secrets.toml the Streamlit app uses.
+    """
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if api_key:
+        return api_key
+
+    secrets_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml")
+    try:
+        with open(secrets_path, "rb") as f:
+            return tomllib.load(f).get("OPENAI_API_KEY")
+    except (FileNotFoundError, tomllib.TOMLDecodeError):
+        return None
+
+def _run(args, api_key):
+    publications = batch.read_publication_list(args.publications)
+    user_context = batch.load_user_context(args.context)
+    if not publications:
+        print("No publications to evaluate.", file=sys.stderr)
+        return 1
+
+    print(f"Evaluating {len(publications)} patents with {args.workers} workers...", file=sys.stderr)
+
+    done = [0]
+    def report_progress(result):
+        done[0] += 1
+        label = result.get("publication_number") or result.get("input")
+        print(f"[{done[0]}/{len(publications)}] {label}: {result.get('status')}", file=sys.stderr)
+
+    # A CLI run is one job for usage accounting and the job token budget
+    job_id = f"cli-{datetime.datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+    with usage.scope(job=job_id):
+        if args.output == "-":
+            results = batch.run_batch(publications, user_context, api_key, output=sys.stdout,
+                                      pdf_dir=args.pdf_dir, max_workers=args.workers, on_result=report_progress)
+        else:
+            with open(args.output, "w", encoding="utf-8") as out:
+                results = batch.run_batch(publications, user_context, api_key, output=out,
+                                          pdf_dir=args.pdf_dir, max_workers=args.workers, on_result=report_progress)
+
+    if args.pack:
+        packed = batch.write_portfolio_pack(results, user_context, args.pack)
+        print(f"Wrote portfolio pack with {packed} reports to {args.pack}", file=sys.stderr)
+
+    failed = sum(1 for r in results if r.get("status") != "ok")
+    print(f"Done: {len(results) - failed} succeeded, {failed} failed.", file=sys.stderr)
+    spent = usage.totals(job=job_id)
+    print(f"Usage ({job_id}): {spent['calls']} calls, {spent['tokens']:,} tokens, ~${spent['cost_usd']:.2f}", file=sys.stderr)
+    return 1 if failed else 0
+
+def _serve(args, api_key):
+    from logic import api_server
+
+    user_context = batch.load_user_context(args.context) if args.context else ""
+    manager = batch.JobManager(api_key, user_context, pdf_dir=args.pdf_dir, max_workers=args.workers)
+    api_server.serve(manager, host=args.host, port=args.port)
+    return 0
+
+def _usage_report(args):
+    since = usage.start_of_day() - (args.days - 1) * 86400 if args.days else None
+    rows = usage.breakdown(args.by, since=since)
+    total = usage.totals(since=since)
+    print(f"{args.by:<28} {'calls':>7} {'failed':>7} {'prompt':>12} {'completion':>12} {'cost $':>9} {'avg ms':>8}")
+    for row in rows + [dict(total, **{args.by: "TOTAL"})]:
+        print(
+            f"{str(row[args.by])[:28]:<28} {row['calls']:>7} {row['failed_calls']:>7} {row['prompt_tokens']:>12,} "
+            f"{row['completion_tokens']:>12,} {row['cost_usd']:>9.2f} {row['avg_latency_ms']:>8}"
+        )
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless IP evaluation.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Evaluate a list of patents and write JSONL results.")
+    run_parser.add_argument("--publications", required=True, help="File with one publication number or URL per line.")
+    run_parser.add_argument("--context", required=True, help="User context file (.json with role/goal/criteria, or plain text).")
+    run_parser.add_argument("--output", default="-", help="JSONL output path ('-' for stdout).")
+    run_parser.add_argument("--pdf-dir", default=None, help="Also write one PDF report per patent into this directory.")
+    run_parser.add_argument("--pack", default=None, help="Also write a zip with per-patent PDFs and a combined portfolio report.")
+    run_parser.add_argument("--workers", type=int, default=4, help="Maximum concurrent scrape/analysis tasks.")
+
+    serve_parser = subparsers.add_parser("serve", help="Run a local HTTP API for submitting and polling jobs.")
+    serve_parser.add_argument("--context", default=None, help="Default user context for jobs that do not provide one.")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--pdf-dir", default=None, help="Directory for PDFs of jobs submitted with \"pdf\": true.")
+    serve_parser.add_argument("--workers", type=int, default=4, help="Maximum concurrent tasks, shared by all jobs.")
+
+    usage_parser = subparsers.add_parser("usage", help="Report recorded model usage and estimated cost.")
+    usage_parser.add_argument("--by", default="session", choices=["session", "user", "job", "patent", "site", "model"])
+    usage_parser.add_argument("--days", type=int, default=None, help="Only the last N days (including today).")
+
+    args = parser.parse_args(argv)
+    if args.command == "usage":
+        return _usage_report(args)
+
+    api_key = load_api_key()
+    if not api_key:
+        print("Please provide an OpenAI API Key via OPENAI_API_KEY or `.streamlit/secrets.toml`.", file=sys.stderr)
+        return 2
+
+    if args.command == "run":
+        return _run(args, api_key)
+    return _serve(args, api_key)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,252 @@
-from openai import OpenAI
-import os
+import concurrent.futures
+import functools
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+
+from logic import model_routing, profiling, usage
+from logic.patent_store import record_key
+from logic.singleflight import SingleFlight
+
+# Identical prompts issued concurrently (e.g. several reviewers evaluating the same patent) share one call
+_completion_flight = SingleFlight()
+
+# Persona-independent patent digests (stage one of analyze_patent), keyed by a hash of the patent text.
+# Bump DIGEST_VERSION when the digest prompt changes; the least recently used are dropped past DIGEST_CACHE_SIZE.
+DIGEST_VERSION = 1
+DIGEST_CACHE_SIZE = 256
+_digest_cache = OrderedDict()
+_digest_cache_lock = threading.Lock()
+
+# Full per-member evaluations (evaluate_portfolio_members), keyed by patent text + user context;
+# the least recently used are dropped past MEMBER_CACHE_SIZE
+MEMBER_CACHE_SIZE = 128
+_member_cache = OrderedDict()
+_member_cache_lock = threading.Lock()
+
+# IPScore pre-fill answers, keyed by patent + questionnaire hash (LRU)
+PREFILL_CACHE_SIZE = 512
+_prefill_cache = OrderedDict()
+_prefill_cache_lock = threading.Lock()
+
+def _cache_get(cache, lock, key):
+    # LRU lookup in one of the OrderedDict caches above
+    with lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+def _cache_put(cache, lock, key, value, max_entries):
+    with lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_entries:
+            cache.popitem(last=False)
 
 def get_client(api_key):
     """
     Configures and returns the OpenAI Client.
+    Clients are kept per key for the life of the process so reruns reuse
+    the same connection pool instead of building a new client each call.
     """
     if not api_key:
         raise ValueError("API Key is required")
     
+    return _cached_client(api_key)
+
+@functools.lru_cache(maxsize=8)
+def _cached_client(api_key):
+    # openai is imported on first use so pages that never call the model don't pay for it
+    from openai import OpenAI
     return OpenAI(api_key=api_key)
 
+# Past the degrade threshold of a token budget, each message is cut to this many characters
+DEGRADED_CONTEXT_CHARS = 40000
+
+# Rate limits, server errors and dropped connections within a latency budget are retried this
+# many times, waiting TRANSIENT_RETRY_DELAY seconds and doubling
+TRANSIENT_RETRIES = 2
+TRANSIENT_RETRY_DELAY = 1.0
+
+def _is_transient(error):
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+    return isinstance(error, (RateLimitError, InternalServerError, APIConnectionError)) and not isinstance(error, APITimeoutError)
+
+def _request(client, site, model, messages, timeout, route, options, degraded=False):
+    request_options = dict(options)
+    if route.max_tokens:
+        request_options.setdefault("max_completion_tokens", route.max_tokens)
+    if route.reasoning_effort:
+        request_options.setdefault("reasoning_effort", route.reasoning_effort)
+    attempts = 1
+    if timeout:
+        # The SDK would retry timeouts too and blow the latency budget, so its retries are off
+        # and only transient errors are retried here; a timeout goes straight to the fallback
+        client = client.with_options(timeout=timeout, max_retries=0)
+        attempts += TRANSIENT_RETRIES
+    for attempt in range(attempts):
+        start = time.perf_counter()
+        try:
+            response = client.chat.completions.create(model=model, messages=messages, **request_options)
+        except Exception as e:
+            # Failed and timed-out calls are logged too (no tokens), then retried, or the caller falls back or fails
+            usage.record(site, model, None, time.perf_counter() - start, degraded, error=type(e).__name__)
+            if attempt + 1 == attempts or not _is_transient(e):
+                raise
+            delay = TRANSIENT_RETRY_DELAY * 2 ** attempt
+            print(f"{site}: {model} failed with {type(e).__name__}, retrying in {delay:g}s", file=sys.stderr)
+            time.sleep(delay)
+            continue
+        usage.record(site, model, getattr(response, "usage", None), time.perf_counter() - start, degraded)
+        return response.choices[0].message.content
+
+def _trim_messages(messages, max_chars):
+    # Cuts the middle, where the long patent excerpts are; the instructions sit at the start and end
+    trimmed = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str) and len(content) > max_chars:
+            head = max_chars * 3 // 4
+            content = f"{content[:head]}\n[... trimmed to stay within the token budget ...]\n{content[-(max_chars - head):]}"
+            message = dict(message, content=content)
+        trimmed.append(message)
+    return trimmed
+
+def _complete(client, site, messages, **options):
+    """
+    Runs a chat completion for a call site (see model_routing) and returns the message text.
+    If the site's model exceeds its latency budget, or still hits rate limits or server errors
+    after TRANSIENT_RETRIES, the call is retried once on the fallback model (with the SDK's retries).
+    Concurrent calls with the same route, messages and options (e.g. response_format) are
+    coalesced into a single API request.
+    Token budgets (see usage) apply first: near a budget the call uses the fallback model and
+    a trimmed context, past it usage.BudgetExceeded is raised. The call's estimated tokens are
+    reserved against the budgets while it runs, so parallel calls can't all pass the same check.
+    """
+    route = model_routing.get_route(site)
+    with usage.reserve(usage.estimate_tokens(messages, route.max_tokens)) as (budget, reason):
+        if budget == "refuse":
+            raise usage.BudgetExceeded(reason)
+        degraded = budget == "degrade"
+        if degraded:
+            route = replace(route, model=route.fallback or route.model, fallback=None)
+            messages = _trim_messages(messages, DEGRADED_CONTEXT_CHARS)
+        prompt_hash = hashlib.sha256(
+            json.dumps([repr(route), messages, options], sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
+        def run():
+            from openai import APITimeoutError
+            try:
+                return _request(client, site, route.model, messages, route.timeout, route, options, degraded)
+            except Exception as e:
+                if not route.fallback or not (isinstance(e, APITimeoutError) or _is_transient(e)):
+                    raise
+                problem = f"exceeded {route.timeout}s" if isinstance(e, APITimeoutError) else f"still failing with {type(e).__name__}"
+                print(f"{site}: {route.model} {problem}, falling back to {route.fallback}", file=sys.stderr)
+                return _request(client, site, route.fallback, messages, None, route, options, degraded)
+
+        with profiling.stage(f"llm: {site}"):
+            return _completion_flight.do(prompt_hash, run)
+
+def format_claims(claims):
+    """
+    Joins scraped claims (dicts with number/text, or plain strings) into one text block.
+    """
+    if not claims:
+        return ""
+    if isinstance(claims[0], dict):
+        return "\n".join([f"{c['number']}: {c['text']}" for c in claims])
+    return "\n".join(claims)
+
+def format_user_context(role, goal, criteria):
+    """
+    Combines the persona fields from the setup page into a single context string for the AI.
+    """
+    return f"""
+    **Role:** {role}
+    **Goal:** {goal}
+    **Specific Criteria:** {criteria}
+    """
+
+def _patent_source_text(patent_data):
+    claims_text = format_claims(patent_data.get('claims'))
+    description_text = "\n".join(patent_data.get('description', []))
+    return f"""
+        Title: {patent_data.get('title')}
+        Publication Number: {patent_data.get('publication_number')}
+        
+        Abstract:
+        {patent_data.get('abstract')}
+        
+        Claims (excerpt):
+        {claims_text[:50000]} 
+        
+        Description (excerpt):
+        {description_text[:100000]}
+        """
+
+@usage.per_patent
+def digest_patent(patent_data, api_key):
+    """
+    Stage one of the evaluation: a persona-independent technical digest of the full patent text.
+    Digests are cached per patent content (the DIGEST_CACHE_SIZE most recent), so changing the
+    user context only re-runs the (much smaller) stage-two evaluation.
+    """
+    source_text = _patent_source_text(patent_data)
+    cache_key = hashlib.sha256(f"{DIGEST_VERSION}\n{source_text}".encode("utf-8")).hexdigest()
+    cached = _cache_get(_digest_cache, _digest_cache_lock, cache_key)
+    if cached is not None:
+        return cached
+
+    client = get_client(api_key)
+    user_prompt = f"""
+        Read the following patent and write a factual technical digest of it. The digest replaces
+        the full text in later evaluations for different readers, so keep every fact such an
+        evaluation needs and leave out opinions about who should use the patent.
+        
+        **Patent Data:**
+        {source_text}
+        
+        **Instruction:**
+        Use these Markdown headers:
+        ### Background & Problem
+        ### Technical Solution (key mechanisms, materials, parameters, embodiments)
+        ### Claim Scope (independent claims in plain language, key limitations of dependent claims)
+        ### Evidence of Maturity (experiments, data, prototypes, manufacturing details)
+        ### Stated Advantages & Known Limitations
+        ### Applications & Markets Mentioned
+        ### Related Art Mentioned
+        
+        Be specific and quantitative. At most 1200 words.
+        """
+    digest = _complete(client, "digest", [
+        {"role": "system", "content": "Act as an expert patent analyst. Summarize faithfully; do not speculate."},
+        {"role": "user", "content": user_prompt}
+    ])
+    _cache_put(_digest_cache, _digest_cache_lock, cache_key, digest, DIGEST_CACHE_SIZE)
+    return digest
+
+@usage.per_patent
 def analyze_patent(patent_data, user_context, api_key):
     """
-    Analyzes the patent data against the evaluation framework using OpenAI GPT-5 mini.
+    Analyzes the patent data against the evaluation framework (model routed as "evaluation").
+    Runs in two stages: the cached digest from digest_patent, then a persona-specific
+    evaluation over that digest.
     """
     try:
         client = get_client(api_key)
         
-        # Prepare data strings
-        claims_text = ""
-        if patent_data.get('claims'):
-            if isinstance(patent_data['claims'][0], dict):
-                claims_text = "\n".join([f"{c['number']}: {c['text']}" for c in patent_data['claims']])
-            else:
-                claims_text = "\n".join(patent_data['claims'])
+        digest = digest_patent(patent_data, api_key)
         
-        description_text = "\n".join(patent_data.get('description', []))
+        # The first claim is kept verbatim; scope questions hinge on its exact wording
+        claims = format_claims(patent_data.get('claims'))
+        first_claim = claims.split("\n", 1)[0][:3000]
         
         system_prompt = "Act as an expert IP analyst, Tech Transfer Officer, and commercialization specialist."
         
@@ -44,11 +265,11 @@ def analyze_patent(patent_data, user_context, api_key):
         Abstract:
         {patent_data.get('abstract')}
         
-        Claims (excerpt):
-        {claims_text[:50000]} 
+        First Claim:
+        {first_claim}
         
-        Description (excerpt):
-        {description_text[:100000]}
+        Technical Digest (prepared from the full claims and description):
+        {digest}
         
         **Instruction:**
         Provide a detailed evaluation based on the following framework.
@@ -83,37 +304,128 @@ def analyze_patent(patent_data, user_context, api_key):
         Note: For 'External internet searches' (e.g. other patents), rely on your internal knowledge or the 'Similar Documents' identified in the patent text if available.
         """
         
-        response = client.chat.completions.create(
-            model="gpt-5-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
-        return response.choices[0].message.content
+        return _complete(client, "evaluation", [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ])
         
     except Exception as e:
         return f"Error analyzing patent: {str(e)}"
 
-def analyze_portfolio(patent_list, user_context, api_key):
+def evaluate_portfolio_members(patent_list, user_context, api_key, max_workers=8, on_result=None):
+    """
+    Runs the full analyze_patent evaluation on every patent of a portfolio, at most max_workers
+    at a time, so the whole pass takes about as long as the slowest single evaluation.
+    `on_result(key, evaluation)` is called from the calling thread as each one finishes.
+    Successful evaluations are cached per patent content and user context.
+    Returns {record_key (publication number, else URL): evaluation} in portfolio order.
+    """
+    evaluations = {}
+    pending = {}
+    for p in patent_list:
+        cache_key = hashlib.sha256(
+            f"{DIGEST_VERSION}\n{user_context}\n{_patent_source_text(p)}".encode("utf-8")
+        ).hexdigest()
+        cached = _cache_get(_member_cache, _member_cache_lock, cache_key)
+        if cached is not None:
+            evaluations[record_key(p)] = cached
+            if on_result:
+                on_result(record_key(p), cached)
+        else:
+            pending[cache_key] = p
+
+    if pending:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+            futures = {
+                executor.submit(usage.propagate(analyze_patent), p, user_context, api_key): (cache_key, p)
+                for cache_key, p in pending.items()
+            }
+            for future in concurrent.futures.as_completed(futures):
+                cache_key, p = futures[future]
+                evaluation = future.result()
+                if evaluation and not evaluation.startswith("Error analyzing patent:"):
+                    _cache_put(_member_cache, _member_cache_lock, cache_key, evaluation, MEMBER_CACHE_SIZE)
+                evaluations[record_key(p)] = evaluation
+                if on_result:
+                    on_result(record_key(p), evaluation)
+
+    return {record_key(p): evaluations[record_key(p)] for p in patent_list}
+
+# Portfolios larger than this are assessed one CPC group at a time before the overall synthesis
+PORTFOLIO_GROUP_THRESHOLD = 6
+
+def _portfolio_text(patent_list, member_evaluations=None):
+    portfolio_text = ""
+    for i, p in enumerate(patent_list):
+        portfolio_text += f"\n--- Patent {i+1}: {p.get('publication_number')} ---\n"
+        portfolio_text += f"Title: {p.get('title')}\n"
+        portfolio_text += f"Abstract: {p.get('abstract')}\n"
+        evaluation = (member_evaluations or {}).get(record_key(p))
+        if evaluation and not evaluation.startswith("Error analyzing patent:"):
+            # The member's own full evaluation already distils its claims and description
+            portfolio_text += f"Individual Evaluation:\n{evaluation[:8000]}\n"
+        else:
+            claims = format_claims(p.get('claims', []))
+            portfolio_text += f"Claims (excerpt): {claims[:5000]}\n"
+    return portfolio_text
+
+def _analyze_patent_group(client, label, patent_list, user_context, member_evaluations=None):
+    """
+    Assesses one technologically coherent group (a CPC cluster) of a larger portfolio.
+    """
+    user_prompt = f"""
+        Assess the following group of related patents (CPC group {label}) based on the user context.
+        This group is part of a larger portfolio; another step combines the group assessments.
+        
+        **User Context:**
+        {user_context}
+        
+        **Patents:**
+        {_portfolio_text(patent_list, member_evaluations)}
+        
+        **Instruction:**
+        In at most 300 words cover: what the group protects, its strongest and weakest patents and why,
+        redundancy within the group, and gaps. Refer to patents by publication number.
+        """
+    return _complete(client, "portfolio_group", [
+        {"role": "system", "content": "Act as an expert IP Portfolio Manager and Strategist."},
+        {"role": "user", "content": user_prompt}
+    ])
+
+def analyze_portfolio(patent_list, user_context, api_key, overlap_clusters=None, cpc_clusters=None, max_workers=4,
+                      member_evaluations=None):
     """
     Analyzes a list of patents as a portfolio.
+    `overlap_clusters` comes from near_duplicates.find_overlaps and `cpc_clusters` from
+    cpc_index.cluster_portfolio; both are computed here if not given. Portfolios above
+    PORTFOLIO_GROUP_THRESHOLD patents get one call per CPC group and a synthesis call over those.
+    `member_evaluations` (from evaluate_portfolio_members) replaces the claim excerpts with
+    each patent's full evaluation.
     """
     try:
         client = get_client(api_key)
-        
-        # Build portfolio context
-        portfolio_text = ""
-        for i, p in enumerate(patent_list):
-            portfolio_text += f"\n--- Patent {i+1}: {p.get('publication_number')} ---\n"
-            portfolio_text += f"Title: {p.get('title')}\n"
-            portfolio_text += f"Abstract: {p.get('abstract')}\n"
-            data_claims = p.get('claims', [])
-            if data_claims and isinstance(data_claims[0], dict):
-                 claims = "\n".join([f"{c['number']}: {c['text']}" for c in data_claims])
-            else:
-                 claims = "\n".join(data_claims)
-            portfolio_text += f"Claims (excerpt): {claims[:5000]}\n"
+
+        from logic import cpc_index, near_duplicates
+        if overlap_clusters is None:
+            overlap_clusters = near_duplicates.find_overlaps(patent_list)
+        overlap_text = near_duplicates.describe_overlaps(overlap_clusters)
+        if cpc_clusters is None:
+            cpc_clusters = cpc_index.cluster_portfolio(patent_list)
+        cluster_text = cpc_index.describe_clusters(cpc_clusters)
+
+        if len(patent_list) > PORTFOLIO_GROUP_THRESHOLD and len(cpc_clusters) > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                group_analyses = list(executor.map(
+                    usage.propagate(lambda item: _analyze_patent_group(client, item[0], item[1], user_context, member_evaluations)),
+                    cpc_clusters.items()
+                ))
+            portfolio_heading = "Group Assessments (one per CPC group)"
+            portfolio_text = ""
+            for (label, records), group_analysis in zip(cpc_clusters.items(), group_analyses):
+                portfolio_text += f"\n--- Group {label} ({len(records)} patents) ---\n{group_analysis}\n"
+        else:
+            portfolio_heading = "Portfolio Data"
+            portfolio_text = _portfolio_text(patent_list, member_evaluations)
 
         system_prompt = "Act as an expert IP Portfolio Manager and Strategist."
         
@@ -123,20 +435,26 @@ def analyze_portfolio(patent_list, user_context, api_key):
         **User Context:**
         {user_context}
         
-        **Portfolio Data:**
+        **{portfolio_heading}:**
         {portfolio_text}
         
+        **CPC Groups (from the patents' classifications):**
+        {cluster_text}
+        
+        **Claim Overlap (precomputed from full claim text):**
+        {overlap_text}
+        
         **Instruction:**
         Provide a strategic portfolio assessment.
         
         ### 1. Portfolio Overview
         * **Summary of Holdings:** [Briefly describe the collection]
-        * **Technological Clusters:** [Group them by tech/approach]
+        * **Technological Clusters:** [Group them by tech/approach, starting from the CPC groups above]
         
         ### 2. Comparative Analysis
         * **Strengths:** [Which patents are strongest and why?]
         * **Weaknesses/Gaps:** [What is missing?]
-        * **Overlap:** [Are they redundant or complementary?]
+        * **Overlap:** [Are they redundant or complementary? Use the precomputed claim overlap above.]
         
         ### 3. Strategic Recommendations
         * **Commercialization Strategy:** [How to bundle or sell?]
@@ -146,19 +464,122 @@ def analyze_portfolio(patent_list, user_context, api_key):
 
         """
          
-        response = client.chat.completions.create(
-            model="gpt-5-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
-        return response.choices[0].message.content
+        return _complete(client, "portfolio", [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ])
         
     except Exception as e:
         return f"Error analyzing portfolio: {str(e)}"
 
 
+def _questionnaire_hash(questions):
+    return hashlib.sha256(
+        json.dumps([[q['code'], q['question'], list(q['options'])] for q in questions], ensure_ascii=False).encode("utf-8")
+    ).hexdigest()[:16]
+
+@usage.per_patent
+def prefill_ip_scores(patent_data, questions, api_key):
+    """
+    Answers every IPScore factor for one patent in a single structured-output call.
+    `questions` is the list from ip_score.load_questions. Returns {factor code: score 1-5},
+    or None if the call failed. Results are cached per patent and questionnaire version.
+    """
+    cache_key = (patent_data.get('publication_number') or patent_data.get('url'), _questionnaire_hash(questions))
+    cached = _cache_get(_prefill_cache, _prefill_cache_lock, cache_key)
+    if cached is not None:
+        return dict(cached)
+
+    try:
+        client = get_client(api_key)
+        
+        factors_text = ""
+        for q in questions:
+            factors_text += f"\n{q['code']}: {q['question']}\n"
+            factors_text += "\n".join(f"    {opt}" for opt in q['options']) + "\n"
+        
+        events_text = "\n".join(
+            f"{e.get('date')}: {e.get('title') or e.get('type')}" for e in patent_data.get('events', [])
+        )
+        description_text = "\n".join(patent_data.get('description', []))
+        
+        system_prompt = "Act as an expert IP analyst scoring patents with the EPO IPScore methodology."
+        
+        user_prompt = f"""
+        Score the following patent on every IPScore factor listed below.
+        
+        **Patent Data:**
+        Title: {patent_data.get('title')}
+        Publication Number: {patent_data.get('publication_number')}
+        Status: {patent_data.get('status')}
+        Assignee: {', '.join(patent_data.get('assignees', {}).get('current', []))}
+        Classifications: {', '.join(c['code'] for c in patent_data.get('classifications', []))}
+        Events:
+        {events_text}
+        
+        Abstract:
+        {patent_data.get('abstract')}
+        
+        Claims (excerpt):
+        {format_claims(patent_data.get('claims'))[:15000]}
+        
+        Description (excerpt):
+        {description_text[:20000]}
+        
+        **Factors:**
+        {factors_text}
+        
+        **Instruction:**
+        For each factor code, return the number (1-5) of the option best supported by the patent data.
+        Where the data says nothing about a factor, choose the most conservative plausible option.
+        """
+        
+        schema = {
+            "type": "object",
+            "properties": {q['code']: {"type": "integer", "enum": [1, 2, 3, 4, 5]} for q in questions},
+            "required": [q['code'] for q in questions],
+            "additionalProperties": False
+        }
+        
+        content = _complete(client, "ip_prefill", [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ], response_format={
+            "type": "json_schema",
+            "json_schema": {"name": "ipscore_answers", "strict": True, "schema": schema}
+        })
+        
+        answers = json.loads(content)
+        scores = {q['code']: int(answers[q['code']]) for q in questions if q['code'] in answers}
+        
+    except Exception as e:
+        print(f"Error pre-filling IP scores: {e}", file=sys.stderr)
+        return None
+
+    _cache_put(_prefill_cache, _prefill_cache_lock, cache_key, dict(scores), PREFILL_CACHE_SIZE)
+    return scores
+
+def prefill_portfolio_scores(patent_list, questions, api_key, max_workers=4, on_progress=None):
+    """
+    Runs prefill_ip_scores over many patents concurrently (one call per patent).
+    Returns {publication number: scores}; patents whose call failed are left out.
+    `on_progress(done, total)` is called from the calling thread as results arrive.
+    """
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(usage.propagate(prefill_ip_scores), p, questions, api_key): p.get('publication_number') or p.get('url')
+            for p in patent_list
+        }
+        for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            scores = future.result()
+            if scores:
+                results[futures[future]] = scores
+            if on_progress:
+                on_progress(done, len(futures))
+    return results
+
+
 
 def format_chat_history(streamlit_messages):
     """
@@ -172,9 +593,10 @@ def format_chat_history(streamlit_messages):
         openai_history.append({"role": role, "content": msg["content"]})
     return openai_history
 
-def chat_with_patent_context(user_message, history, patent_context_str, api_key):
+def chat_with_patent_context(user_message, history, patent_context_str, api_key, site="chat"):
     """
     Sends a message to OpenAI with the patent context (if first message) and history.
+    `site` picks the model route ("chat" for the sidebar, "section_chat" for the results tabs).
     """
     try:
         client = get_client(api_key)
@@ -198,13 +620,11 @@ def chat_with_patent_context(user_message, history, patent_context_str, api_key)
         # Append current user message
         messages.append({"role": "user", "content": user_message})
         
-        response = client.chat.completions.create(
-            model="gpt-5-mini",
-            messages=messages
-        )
-        return response.choices[0].message.content
+        return _complete(client, site, messages)
     except Exception as e:
         return f"Error in chat: {str(e)}"
+
+@profiling.timed("parse_evaluation_sections")
 def parse_evaluation_sections(markdown_text):
     """
     Parses the structured Markdown evaluation into a dictionary of sections.
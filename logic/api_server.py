@@ -0,0 +1,80 @@
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    Minimal JSON API over a batch.JobManager:
+
+    POST /jobs            {"publications": [...], "user_context": "...", "pdf": false} -> {"job_id": ...}
+    GET  /jobs            -> list of jobs (without results)
+    GET  /jobs/<job_id>   -> job status and results so far
+    """
+
+    manager = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+        if parts == ["jobs"]:
+            self._send_json(200, {"jobs": self.manager.list_jobs()})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.manager.get(parts[1])
+            if job is None:
+                self._send_json(404, {"error": f"Unknown job {parts[1]}"})
+            else:
+                self._send_json(200, job)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+        if parts != ["jobs"]:
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            self._send_json(400, {"error": "Request body must be JSON"})
+            return
+        if not isinstance(payload, dict):
+            self._send_json(400, {"error": "Request body must be a JSON object"})
+            return
+
+        publications = payload.get("publications")
+        if not isinstance(publications, list) or not publications:
+            self._send_json(400, {"error": "'publications' must be a non-empty list"})
+            return
+
+        job_id = self.manager.submit(
+            [str(p) for p in publications],
+            user_context=payload.get("user_context"),
+            pdf=bool(payload.get("pdf"))
+        )
+        self._send_json(202, {"job_id": job_id, "status_url": f"/jobs/{job_id}"})
+
+    def log_message(self, format, *args):
+        print(f"[api] {self.address_string()} {format % args}", file=sys.stderr)
+
+def serve(manager, host="127.0.0.1", port=8765):
+    """
+    Runs the job API until interrupted. Binds to localhost by default.
+    """
+    handler = type("JobRequestHandler", (_JobRequestHandler,), {"manager": manager})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"IP Evaluation API listening on http://{host}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,254 @@
+import concurrent.futures
+import contextlib
+import datetime
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+
+from logic import scraper
+from logic import analysis
+from logic import patent_store
+from logic import usage
+
+# Finished API jobs (with their results) are kept this long for polling, and at most this many
+FINISHED_JOB_TTL = 3600
+MAX_FINISHED_JOBS = 100
+
+def load_user_context(path):
+    """
+    Reads the user context file for a headless run.
+    A .json file may hold "role", "goal" and "criteria" keys (the same fields as the
+    setup page); any other file is used verbatim as the context text.
+    """
+    with open(path, encoding="utf-8") as f:
+        raw = f.read()
+
+    if path.lower().endswith(".json"):
+        fields = json.loads(raw)
+        return analysis.format_user_context(
+            fields.get("role", ""),
+            fields.get("goal", ""),
+            fields.get("criteria", "")
+        )
+    return raw
+
+def read_publication_list(path):
+    """
+    Reads publication numbers or URLs, one per line. Blank lines and '#' comments are skipped
+    (a comment starts a line or follows whitespace, so URL fragments are kept).
+    """
+    publications = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = re.split(r"(?:^|\s)#", line, maxsplit=1)[0].strip()
+            if line:
+                publications.append(line)
+    return publications
+
+def evaluate_publication(publication, user_context, api_key, pdf_dir=None):
+    """
+    Scrapes and analyzes a single patent. Returns a JSON-serialisable result dict;
+    failures are reported in the dict rather than raised so one bad patent does not stop a batch.
+    "status" is "ok", "error", or "partial" when the evaluation succeeded but its PDF did not.
+    """
+    result = {
+        "input": publication,
+        "publication_number": None,
+        "url": None,
+        "title": None,
+        "abstract": None,
+        "status": "error",
+        "error": None,
+        "evaluation": None,
+        "pdf_path": None,
+        "evaluated_at": None
+    }
+
+    url = scraper.build_patent_url(publication)
+    patent_data = scraper.scrape_patent(url)
+    if not patent_data:
+        result["error"] = f"Failed to scrape {publication}"
+        return result
+
+    result["publication_number"] = patent_data.get("publication_number")
+    result["url"] = patent_data.get("url")
+    result["title"] = patent_data.get("title")
+    result["abstract"] = patent_data.get("abstract")
+
+    evaluation = analysis.analyze_patent(patent_data, user_context, api_key)
+    result["evaluation"] = evaluation
+    result["evaluated_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+    if not evaluation or evaluation.startswith("Error analyzing patent:"):
+        result["error"] = evaluation or "Empty evaluation returned"
+        return result
+
+    if pdf_dir:
+        # fpdf is only needed when reports are requested
+        from logic import report_generator
+
+        os.makedirs(pdf_dir, exist_ok=True)
+        name = patent_data.get("publication_number") or publication
+        safe_name = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in name)
+        pdf_path = os.path.join(pdf_dir, f"IP_Report_{safe_name}.pdf")
+        try:
+            report_generator.write_pdf(pdf_path, patent_data, evaluation, user_context)
+            result["pdf_path"] = pdf_path
+        except Exception as e:
+            result["error"] = f"PDF generation failed: {e}"
+            result["status"] = "partial"
+            return result
+
+    result["status"] = "ok"
+    return result
+
+def run_batch(publications, user_context, api_key, output=None, pdf_dir=None, max_workers=4, on_result=None, executor=None):
+    """
+    Evaluates a list of publications with at most max_workers scrapes/analyses in flight.
+    Each result is written to `output` (a file-like object) as one JSON line as soon as it
+    completes, and passed to `on_result` if given. Returns the list of results in input order.
+    Pass an `executor` to share its workers with other batches (max_workers is then ignored).
+    """
+    results = [None] * len(publications)
+    write_lock = threading.Lock()
+
+    with contextlib.ExitStack() as stack:
+        if executor is None:
+            executor = stack.enter_context(concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)))
+        futures = {
+            executor.submit(usage.propagate(evaluate_publication), pub, user_context, api_key, pdf_dir): i
+            for i, pub in enumerate(publications)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            i = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"input": publications[i], "status": "error", "error": str(e)}
+            results[i] = result
+
+            with write_lock:
+                if output is not None:
+                    output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    output.flush()
+                if on_result:
+                    on_result(result)
+
+    return results
+
+def write_portfolio_pack(results, user_context, path):
+    """
+    Writes a zip with one PDF per successfully evaluated patent plus a combined report.
+    """
+    from logic import report_generator
+
+    # "partial" results have an evaluation, only their own PDF failed
+    evaluated = [r for r in results if r and r.get("status") in ("ok", "partial")]
+    evaluations = {patent_store.record_key(r): r["evaluation"] for r in evaluated}
+    report_generator.create_portfolio_pack(evaluated, evaluations, user_context, output=path)
+    return len(evaluated)
+
+class JobManager:
+    """
+    Keeps track of batch jobs submitted through the local HTTP API.
+    Jobs run in background threads and can be polled by id. All jobs share one pool of
+    max_workers, so concurrent jobs queue instead of multiplying scrapes and model calls.
+    Model usage is charged to the job id, so each job is held to the job token budget (see usage).
+    Finished jobs are forgotten after FINISHED_JOB_TTL seconds or beyond MAX_FINISHED_JOBS.
+    """
+
+    def __init__(self, api_key, default_user_context="", pdf_dir=None, max_workers=4):
+        self.api_key = api_key
+        self.default_user_context = default_user_context
+        self.pdf_dir = pdf_dir
+        self.max_workers = max_workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="batch")
+        self._jobs = {}
+        # job id -> time.monotonic() when it finished, oldest first
+        self._finished = {}
+        self._lock = threading.Lock()
+
+    def _evict_finished(self):
+        # Called with self._lock held
+        cutoff = time.monotonic() - FINISHED_JOB_TTL
+        for job_id, finished in list(self._finished.items()):
+            if finished >= cutoff and len(self._finished) <= MAX_FINISHED_JOBS:
+                break
+            del self._finished[job_id]
+            del self._jobs[job_id]
+
+    def submit(self, publications, user_context=None, pdf=False):
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "total": len(publications),
+            "completed": 0,
+            "failed": 0,
+            "submitted_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "finished_at": None,
+            "results": []
+        }
+        with self._lock:
+            self._evict_finished()
+            self._jobs[job_id] = job
+
+        context = user_context if user_context is not None else self.default_user_context
+        pdf_dir = os.path.join(self.pdf_dir, job_id) if (pdf and self.pdf_dir) else None
+
+        thread = threading.Thread(
+            target=self._run,
+            args=(job_id, publications, context, pdf_dir),
+            daemon=True
+        )
+        thread.start()
+        return job_id
+
+    def _run(self, job_id, publications, user_context, pdf_dir):
+        def record(result):
+            with self._lock:
+                job = self._jobs[job_id]
+                job["results"].append(result)
+                job["completed"] += 1
+                if result.get("status") != "ok":
+                    job["failed"] += 1
+
+        with self._lock:
+            self._jobs[job_id]["status"] = "running"
+        try:
+            with usage.scope(job=job_id):
+                run_batch(publications, user_context, self.api_key, pdf_dir=pdf_dir,
+                          on_result=record, executor=self._executor)
+            status = "done"
+        except Exception as e:
+            print(f"Batch job {job_id} failed: {e}", file=sys.stderr)
+            status = "failed"
+        with self._lock:
+            self._jobs[job_id]["status"] = status
+            self._jobs[job_id]["finished_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+            self._finished[job_id] = time.monotonic()
+
+    def get(self, job_id, include_results=True):
+        """
+        Returns a copy of the job record, or None if the id is unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            if include_results:
+                job["results"] = list(job["results"])
+            else:
+                job.pop("results")
+        job["usage"] = usage.totals(job=job_id)
+        return job
+
+    def list_jobs(self):
+        with self._lock:
+            self._evict_finished()
+            job_ids = list(self._jobs)
+        return [self.get(job_id, include_results=False) for job_id in job_ids]
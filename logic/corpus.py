@@ -0,0 +1,104 @@
+import json
+import os
+import re
+import sys
+import threading
+
+# Every successfully scraped patent is kept here as <publication number>.json
+CORPUS_DIR = os.environ.get(
+    "IP_EVAL_CORPUS_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "corpus")
+)
+
+_listeners = []
+_listeners_lock = threading.Lock()
+
+def _record_path(key):
+    safe_name = re.sub(r'[^A-Za-z0-9_-]', '_', key)
+    return os.path.join(CORPUS_DIR, f"{safe_name}.json")
+
+def add_listener(callback):
+    """
+    Registers callback(record) to run after each record is saved (e.g. to update an index).
+    """
+    with _listeners_lock:
+        if callback not in _listeners:
+            _listeners.append(callback)
+
+def save_record(record):
+    """
+    Persists a scraped record and notifies listeners. Records without a publication number are skipped.
+    """
+    key = record.get('publication_number')
+    if not key:
+        return None
+
+    try:
+        os.makedirs(CORPUS_DIR, exist_ok=True)
+        path = _record_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error saving {key} to corpus: {e}", file=sys.stderr)
+        return None
+
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for callback in listeners:
+        try:
+            callback(record)
+        except Exception as e:
+            print(f"Corpus listener failed for {key}: {e}", file=sys.stderr)
+    return key
+
+def load_record(key):
+    """
+    Returns the cached record for a publication number, or None.
+    """
+    try:
+        with open(_record_path(key), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def iter_records():
+    """
+    Yields every cached record.
+    """
+    if not os.path.isdir(CORPUS_DIR):
+        return
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(CORPUS_DIR, name), encoding='utf-8') as f:
+                yield json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Skipping unreadable corpus file {name}: {e}", file=sys.stderr)
+
+def count():
+    if not os.path.isdir(CORPUS_DIR):
+        return 0
+    return sum(1 for name in os.listdir(CORPUS_DIR) if name.endswith('.json'))
+
+def version():
+    """
+    (record count, latest modification time in ns) of the corpus: changes whenever a record
+    is added or re-saved, by this process or another (e.g. a CLI run), so it can key caches.
+    """
+    if not os.path.isdir(CORPUS_DIR):
+        return (0, 0)
+    files = 0
+    latest = 0
+    with os.scandir(CORPUS_DIR) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                latest = max(latest, entry.stat().st_mtime_ns)
+            except OSError:
+                continue
+            files += 1
+    return (files, latest)
@@ -0,0 +1,234 @@
+import re
+import threading
+from collections import OrderedDict
+
+from logic import corpus
+
+# CPC hierarchy, top down: H / H01 / H01M / H01M 10 / H01M 10/052
+LEVELS = ("section", "class", "subclass", "group", "subgroup")
+
+CPC_CODE_RE = re.compile(r"^([A-HY])(?:(\d{2})(?:([A-Z])(?:(\d{1,4})(?:/(\d{0,6}))?)?)?)?$")
+
+UNCLASSIFIED = "Unclassified"
+
+# group() results kept per index (one entry per level and session portfolio), least recently used dropped first
+GROUP_CACHE_SIZE = 64
+
+def _normalize(code):
+    return re.sub(r"\s+", "", (code or "").upper())
+
+def cpc_path(code):
+    """
+    Labels of a CPC code at each hierarchy level, e.g. 'H01M10/052' ->
+    ['H', 'H01', 'H01M', 'H01M 10', 'H01M 10/052']. Returns [] for anything that isn't a CPC code.
+    """
+    match = CPC_CODE_RE.match(_normalize(code))
+    if not match:
+        return []
+    section, cls, subclass, group, subgroup = match.groups()
+    path = [section]
+    if cls:
+        path.append(f"{section}{cls}")
+    if subclass:
+        path.append(f"{section}{cls}{subclass}")
+    if group:
+        path.append(f"{section}{cls}{subclass} {group}")
+    if subgroup:
+        path.append(f"{section}{cls}{subclass} {group}/{subgroup}")
+    return path
+
+def _record_id(record):
+    return record.get('publication_number') or record.get('url')
+
+class _Node:
+    __slots__ = ("children", "patents")
+
+    def __init__(self):
+        self.children = {}
+        # Every patent classified at or below this node
+        self.patents = set()
+
+class CPCIndex:
+    """
+    Trie over CPC codes, one level per hierarchy step. Each node holds the patents in
+    its subtree, so a prefix query or a group-by at any depth is a walk down the trie.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._codes = {}
+        self._descriptions = {}
+        # group() results per (level, scope), LRU; dropped whenever a patent is (re)indexed
+        self._group_cache = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._codes)
+
+    def add(self, record):
+        """
+        Indexes (or re-indexes) the classifications of one scraped record.
+        """
+        doc_id = _record_id(record)
+        if not doc_id:
+            return
+        paths = []
+        for classification in record.get('classifications', []):
+            path = cpc_path(classification.get('code'))
+            if path:
+                paths.append(path)
+                if classification.get('description'):
+                    self._descriptions.setdefault(path[-1], classification['description'])
+        with self._lock:
+            self._group_cache.clear()
+            self._remove(doc_id)
+            for path in paths:
+                node = self._root
+                for label in path:
+                    node = node.children.setdefault(label, _Node())
+                    node.patents.add(doc_id)
+            self._codes[doc_id] = paths
+
+    def _remove(self, doc_id):
+        paths = self._codes.pop(doc_id, None)
+        if not paths:
+            return
+        for path in paths:
+            node = self._root
+            for label in path:
+                node = node.children.get(label)
+                if node is None:
+                    break
+                node.patents.discard(doc_id)
+
+    def description(self, label):
+        return self._descriptions.get(label)
+
+    def labels(self, doc_id, level):
+        """
+        The CPC labels of one indexed patent at `level`.
+        """
+        depth = LEVELS.index(level) + 1
+        with self._lock:
+            return {path[depth - 1] for path in self._codes.get(doc_id, ()) if len(path) >= depth}
+
+    def query(self, pattern, within=None):
+        """
+        Patents classified under a CPC prefix such as 'H01M', 'H01M 10/*' or 'H01M 10/05*',
+        optionally restricted to the ids in `within`. Returns a sorted list of ids.
+        """
+        wildcard = pattern.strip().endswith("*")
+        prefix = _normalize(pattern).rstrip("*")
+        path = cpc_path(prefix.rstrip("/"))
+        if not path:
+            return []
+
+        with self._lock:
+            node = self._root
+            for label in path[:-1]:
+                node = node.children.get(label)
+                if node is None:
+                    return []
+            last = path[-1]
+            if last in node.children:
+                matches = set(node.children[last].patents)
+            elif wildcard:
+                # Partial last segment ('H01M 10/05*'): union every sibling it prefixes
+                matches = set()
+                for label, child in node.children.items():
+                    if label.startswith(last):
+                        matches |= child.patents
+            else:
+                return []
+
+        if within is not None:
+            matches &= set(within)
+        return sorted(matches)
+
+    def group(self, level="subclass", within=None):
+        """
+        {label: sorted ids} of the patents under each CPC node at `level`. A patent with codes
+        in several groups appears in each of them. Results are cached until the index changes;
+        treat them as read-only.
+        """
+        depth = LEVELS.index(level) + 1
+        within = frozenset(within) if within is not None else None
+        cache_key = (level, within)
+        with self._lock:
+            cached = self._group_cache.get(cache_key)
+            if cached is not None:
+                self._group_cache.move_to_end(cache_key)
+                return cached
+            groups = {}
+            frontier = [(self._root, 0)]
+            while frontier:
+                node, node_depth = frontier.pop()
+                for label, child in node.children.items():
+                    if node_depth + 1 == depth:
+                        members = child.patents & within if within is not None else child.patents
+                        if members:
+                            groups[label] = sorted(members)
+                    else:
+                        frontier.append((child, node_depth + 1))
+            groups = dict(sorted(groups.items()))
+            self._group_cache[cache_key] = groups
+            while len(self._group_cache) > GROUP_CACHE_SIZE:
+                self._group_cache.popitem(last=False)
+        return groups
+
+def cluster_portfolio(patent_list, level="subclass"):
+    """
+    Partitions a portfolio into CPC groups at `level`. Each patent goes to the group that
+    covers the most of the portfolio among its own codes, so related patents end up together.
+    Returns {label: [records]}, largest group first; patents without CPC codes go to 'Unclassified'.
+    """
+    index = CPCIndex()
+    for record in patent_list:
+        index.add(record)
+    groups = index.group(level)
+
+    clusters = {}
+    for record in patent_list:
+        labels = index.labels(_record_id(record), level)
+        if labels:
+            label = min(labels, key=lambda l: (-len(groups[l]), l))
+        else:
+            label = UNCLASSIFIED
+        clusters.setdefault(label, []).append(record)
+    return dict(sorted(clusters.items(), key=lambda item: (item[0] == UNCLASSIFIED, -len(item[1]), item[0])))
+
+def _label_description(label, records):
+    for record in records:
+        for classification in record.get('classifications', []):
+            if classification.get('description') and cpc_path(classification.get('code'))[-1:] == [label]:
+                return classification['description']
+    return None
+
+def describe_clusters(clusters):
+    """
+    Plain-text summary of cluster_portfolio output for prompts.
+    """
+    lines = []
+    for label, records in clusters.items():
+        description = _label_description(label, records)
+        heading = f"{label} ({description})" if description else label
+        lines.append(f"{heading}: {', '.join(_record_id(r) for r in records)}")
+    return "\n".join(lines)
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """
+    The process-wide CPC index over the corpus, kept up to date as new scrapes are saved.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = CPCIndex()
+                corpus.add_listener(index.add)
+                for record in corpus.iter_records():
+                    index.add(record)
+                _index = index
+    return _index
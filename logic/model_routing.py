@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+import tomllib
+from dataclasses import dataclass, replace
+
+# Routing config lives outside the code: models.toml in the project root (or IP_EVAL_MODELS_CONFIG),
+# with per-site environment overrides such as IP_EVAL_MODEL_CHAT=gpt-5-nano or IP_EVAL_TIMEOUT_CHAT=10.
+CONFIG_PATH = os.environ.get(
+    "IP_EVAL_MODELS_CONFIG",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models.toml")
+)
+
+@dataclass(frozen=True)
+class Route:
+    """
+    How one call site talks to the model. `timeout` (seconds) is the latency budget of each
+    attempt on the primary model; when it runs out, or rate limits and server errors outlast
+    the retries, the call is retried once on `fallback`.
+    `max_tokens` caps the completion (reasoning included); None leaves it to the API.
+    """
+    model: str
+    fallback: str = None
+    timeout: float = None
+    max_tokens: int = None
+    reasoning_effort: str = None
+
+# Used for any site or field the config file doesn't set
+DEFAULT_ROUTES = {
+    "digest": Route("gpt-5-mini", fallback="gpt-5-nano", timeout=240),
+    "evaluation": Route("gpt-5-mini", fallback="gpt-5-nano", timeout=180),
+    "portfolio": Route("gpt-5-mini", fallback="gpt-5-nano", timeout=180),
+    "portfolio_group": Route("gpt-5-mini", fallback="gpt-5-nano", timeout=120),
+    "ip_prefill": Route("gpt-5-mini", fallback="gpt-5-nano", timeout=120),
+    "chat": Route("gpt-5-mini", fallback="gpt-5-nano", timeout=30, max_tokens=4000, reasoning_effort="low"),
+    "section_chat": Route("gpt-5-nano", fallback=None, timeout=30, max_tokens=4000, reasoning_effort="low"),
+}
+
+_FIELD_TYPES = {"model": str, "fallback": str, "timeout": float, "max_tokens": int, "reasoning_effort": str}
+
+_routes = None
+_routes_lock = threading.Lock()
+
+def _cast(field, value):
+    """
+    A route field from the config file or the environment, as the type Route expects.
+    Empty values unset the field; anything else that doesn't fit raises ValueError.
+    """
+    if value is None or value == "":
+        return None
+    cast = _FIELD_TYPES[field]
+    if isinstance(value, bool) or (cast is str and not isinstance(value, str)):
+        raise ValueError(f"expected {cast.__name__}")
+    value = cast(value)
+    if cast is not str and value <= 0:
+        raise ValueError("must be positive")
+    return value
+
+def _fields(values, source):
+    fields = {}
+    for field, value in values.items():
+        try:
+            fields[field] = _cast(field, value)
+        except (TypeError, ValueError) as e:
+            print(f"Ignoring invalid {source(field)}={value!r}: {e}", file=sys.stderr)
+    return fields
+
+def _env_overrides(site):
+    values = {}
+    for field in _FIELD_TYPES:
+        value = os.environ.get(f"IP_EVAL_{field.upper()}_{site.upper()}")
+        if value is not None:
+            values[field] = value
+    return _fields(values, lambda field: f"IP_EVAL_{field.upper()}_{site.upper()}")
+
+def _apply(route, fields):
+    # An empty model ("" in the file or the environment) keeps the one already set
+    if not fields.get("model", route.model):
+        fields.pop("model")
+    return replace(route, **fields)
+
+def load_routes(path=CONFIG_PATH):
+    """
+    Defaults, overlaid with the [sites.<name>] tables of the config file, overlaid with env variables.
+    """
+    routes = dict(DEFAULT_ROUTES)
+    try:
+        with open(path, 'rb') as f:
+            sites = tomllib.load(f).get("sites", {})
+    except FileNotFoundError:
+        sites = {}
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        print(f"Error reading model config {path}: {e}", file=sys.stderr)
+        sites = {}
+
+    for site, table in sites.items():
+        base = routes.get(site) or Route(table.get("model") or DEFAULT_ROUTES["evaluation"].model)
+        fields = _fields({k: v for k, v in table.items() if k in _FIELD_TYPES}, lambda field: f"[sites.{site}] {field}")
+        routes[site] = _apply(base, fields)
+    for site in list(routes):
+        overrides = _env_overrides(site)
+        if overrides:
+            routes[site] = _apply(routes[site], overrides)
+    return routes
+
+def get_route(site):
+    """
+    The route for a call site; unknown sites use the 'evaluation' route.
+    """
+    global _routes
+    if _routes is None:
+        with _routes_lock:
+            if _routes is None:
+                _routes = load_routes()
+    return _routes.get(site) or _routes["evaluation"]
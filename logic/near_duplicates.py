@@ -0,0 +1,257 @@
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from logic import corpus
+
+# 128 hash functions in 64 bands of 2 rows. A pair with Jaccard similarity s becomes a
+# candidate with probability 1 - (1 - s^2)^64: 0.93 at 0.2, 0.998 at 0.3 and ~1.0 from 0.4,
+# so pairs at OVERLAP_THRESHOLD are not lost; unrelated claims (s ~0.05) pass 15% of the time
+# and are dropped by the exact signature comparison.
+NUM_PERM = 128
+BANDS = 64
+SHINGLE_SIZE = 5
+
+# Up to this many records, overlapping_pairs compares every pair's signatures directly
+# instead of going through the buckets (always the case for a single portfolio)
+EXACT_PAIRS_LIMIT = 256
+
+# Estimated claim similarity at which two patents are reported as overlapping,
+# and above which they are most likely the same family (continuations, divisionals, re-filings)
+OVERLAP_THRESHOLD = 0.5
+FAMILY_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64) % _MERSENNE_PRIME
+_PERM_B = _rng.randint(0, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64) % _MERSENNE_PRIME
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+def claim_shingles(record):
+    """
+    Hashed word 5-grams over all claim text of a record.
+    """
+    texts = []
+    for claim in record.get('claims', []):
+        texts.append(claim.get('text') if isinstance(claim, dict) else claim)
+    words = WORD_RE.findall(" ".join(t for t in texts if t).lower())
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode())
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+def signature(record):
+    """
+    MinHash signature (NUM_PERM uint32 values) of a record's claims, or None if it has no claim text.
+    """
+    shingles = claim_shingles(record)
+    if not shingles:
+        return None
+    hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    # (a * x + b) mod p for every permutation and shingle at once; uint64 wrap-around is intended
+    with np.errstate(over='ignore'):
+        permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME
+    return (permuted & _MAX_HASH).min(axis=0).astype(np.uint32)
+
+def estimated_similarity(sig_a, sig_b):
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+class OverlapDetector:
+    """
+    MinHash + LSH banding over claim shingles. Each record is hashed into one bucket per band;
+    in larger indexes only records sharing a bucket are compared, so finding overlaps is sub-quadratic.
+    """
+
+    def __init__(self):
+        self._signatures = {}
+        self._titles = {}
+        self._buckets = [{} for _ in range(BANDS)]
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, sig):
+        rows = NUM_PERM // BANDS
+        return [sig[b * rows:(b + 1) * rows].tobytes() for b in range(BANDS)]
+
+    def add(self, record, sig=None):
+        doc_id = record.get('publication_number')
+        if not doc_id:
+            return
+        sig = signature(record) if sig is None else sig
+        if sig is None:
+            return
+        with self._lock:
+            self._remove(doc_id)
+            self._signatures[doc_id] = sig
+            self._titles[doc_id] = record.get('title')
+            for band, key in zip(self._buckets, self._band_keys(sig)):
+                band.setdefault(key, set()).add(doc_id)
+
+    def _remove(self, doc_id):
+        sig = self._signatures.pop(doc_id, None)
+        if sig is None:
+            return
+        self._titles.pop(doc_id, None)
+        for band, key in zip(self._buckets, self._band_keys(sig)):
+            members = band.get(key)
+            if members:
+                members.discard(doc_id)
+                if not members:
+                    del band[key]
+
+    def known_signature(self, record):
+        """
+        The stored signature of an indexed record, or None (the corpus listener re-indexes
+        a patent whenever it is scraped again, so stored signatures are current).
+        """
+        with self._lock:
+            return self._signatures.get(record.get('publication_number'))
+
+    def matches(self, record, threshold=OVERLAP_THRESHOLD, sig=None):
+        """
+        Indexed patents whose claims overlap with `record`, most similar first.
+        """
+        if sig is None:
+            sig = self.known_signature(record)
+        if sig is None:
+            sig = signature(record)
+        if sig is None:
+            return []
+        own_id = record.get('publication_number')
+        with self._lock:
+            candidates = set()
+            for band, key in zip(self._buckets, self._band_keys(sig)):
+                candidates.update(band.get(key, ()))
+            candidates.discard(own_id)
+            results = []
+            for doc_id in candidates:
+                similarity = estimated_similarity(sig, self._signatures[doc_id])
+                if similarity >= threshold:
+                    results.append({
+                        "publication_number": doc_id,
+                        "title": self._titles.get(doc_id),
+                        "similarity": round(similarity, 2),
+                        "relation": _relation(similarity)
+                    })
+        return sorted(results, key=lambda r: r["similarity"], reverse=True)
+
+    def overlapping_pairs(self, threshold=OVERLAP_THRESHOLD):
+        """
+        All (id_a, id_b, similarity) pairs above threshold among indexed records.
+        """
+        with self._lock:
+            if len(self._signatures) <= EXACT_PAIRS_LIMIT:
+                return self._all_pairs(threshold)
+            seen = set()
+            pairs = []
+            for band in self._buckets:
+                for members in band.values():
+                    if len(members) < 2:
+                        continue
+                    ordered = sorted(members)
+                    for i, a in enumerate(ordered):
+                        for b in ordered[i + 1:]:
+                            if (a, b) in seen:
+                                continue
+                            seen.add((a, b))
+                            similarity = estimated_similarity(self._signatures[a], self._signatures[b])
+                            if similarity >= threshold:
+                                pairs.append((a, b, similarity))
+        return pairs
+
+    def _all_pairs(self, threshold):
+        # Called with self._lock held; one vectorized comparison of every signature pair
+        ids = sorted(self._signatures)
+        if len(ids) < 2:
+            return []
+        sigs = np.stack([self._signatures[doc_id] for doc_id in ids])
+        similarity = (sigs[:, None, :] == sigs[None, :, :]).sum(axis=2) / NUM_PERM
+        rows, cols = np.nonzero(np.triu(similarity >= threshold, k=1))
+        return [(ids[i], ids[j], float(similarity[i, j])) for i, j in zip(rows, cols)]
+
+    def clusters(self, threshold=OVERLAP_THRESHOLD):
+        """
+        Groups of mutually overlapping patents (connected components of overlapping pairs).
+        """
+        return _cluster_pairs(self.overlapping_pairs(threshold), self._titles)
+
+def _relation(similarity):
+    return "likely same family" if similarity >= FAMILY_THRESHOLD else "overlapping claims"
+
+def _cluster_pairs(pairs, titles):
+    parent = {}
+
+    def find(x):
+        while parent.setdefault(x, x) != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b, _ in pairs:
+        parent[find(a)] = find(b)
+
+    groups = {}
+    for a, b, similarity in pairs:
+        root = find(a)
+        group = groups.setdefault(root, {"members": set(), "pairs": []})
+        group["members"].update((a, b))
+        group["pairs"].append({"a": a, "b": b, "similarity": round(similarity, 2), "relation": _relation(similarity)})
+
+    clusters = []
+    for group in groups.values():
+        clusters.append({
+            "members": sorted(group["members"]),
+            "titles": {m: titles.get(m) for m in group["members"]},
+            "pairs": sorted(group["pairs"], key=lambda p: p["similarity"], reverse=True),
+            "max_similarity": max(p["similarity"] for p in group["pairs"])
+        })
+    return sorted(clusters, key=lambda c: (len(c["members"]), c["max_similarity"]), reverse=True)
+
+def find_overlaps(patent_list, threshold=OVERLAP_THRESHOLD):
+    """
+    Overlap clusters within one portfolio. Signatures already computed by the corpus-wide
+    detector are reused.
+    """
+    detector = OverlapDetector()
+    for record in patent_list:
+        detector.add(record, sig=_detector.known_signature(record) if _detector is not None else None)
+    return detector.clusters(threshold)
+
+def describe_overlaps(clusters):
+    """
+    Plain-text summary of overlap clusters for the portfolio prompt.
+    """
+    if not clusters:
+        return "No significant claim overlap was detected between these patents."
+    lines = []
+    for i, cluster in enumerate(clusters, start=1):
+        lines.append(f"Cluster {i}: {', '.join(cluster['members'])}")
+        for pair in cluster["pairs"]:
+            lines.append(f"  - {pair['a']} / {pair['b']}: ~{pair['similarity']:.0%} claim similarity ({pair['relation']})")
+    return "\n".join(lines)
+
+_detector = None
+_detector_lock = threading.Lock()
+
+def get_detector():
+    """
+    Process-wide detector over the whole corpus, kept up to date as new scrapes are saved.
+    """
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                detector = OverlapDetector()
+                corpus.add_listener(detector.add)
+                for record in corpus.iter_records():
+                    detector.add(record)
+                _detector = detector
+    return _detector
@@ -0,0 +1,191 @@
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# Soft upper bound for unpinned records; pinned (leased) records are never evicted.
+DEFAULT_MAX_BYTES = int(os.environ.get("IP_EVAL_STORE_MAX_MB", "512")) * 1024 * 1024
+
+def estimate_size(obj):
+    """
+    Rough deep size of a scraped record (dicts, lists and strings), in bytes.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set)):
+            stack.extend(item)
+    return total
+
+def record_key(patent_data):
+    """
+    Store key for a scraped record: its publication number, or the URL if parsing failed.
+    """
+    return patent_data.get("publication_number") or patent_data.get("url")
+
+class StoreLease:
+    """
+    A session's claim on a set of store keys. The references are released
+    explicitly via release() or automatically when the lease is garbage collected
+    (e.g. when Streamlit drops an ended session's state).
+    """
+
+    def __init__(self, store, keys):
+        self.keys = tuple(keys)
+        self._finalizer = weakref.finalize(self, store.release, self.keys)
+
+    def release(self):
+        self._finalizer()
+
+class PatentStore:
+    """
+    Process-wide, reference-counted store of scraped patent records.
+    Sessions keep only keys; records nobody references are evicted
+    least-recently-used first once the store grows past max_bytes.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._evictions = 0
+        self._lock = threading.RLock()
+
+    def put(self, patent_data):
+        """
+        Adds (or refreshes) a record and returns its key. The record is unpinned and may be
+        evicted by the next put; use put_many() to keep what was just stored.
+        """
+        with self._lock:
+            key = self._insert(patent_data)
+            self._evict()
+        return key
+
+    def put_many(self, records):
+        """
+        Adds (or refreshes) records and returns a StoreLease pinning them, in order, as
+        lease.keys. Inserting and pinning happen under one lock, so a record can never be
+        evicted between being stored and being leased (even if it alone exceeds max_bytes).
+        """
+        with self._lock:
+            keys = [self._insert(patent_data) for patent_data in records]
+            self.acquire(keys)
+            self._evict()
+            return StoreLease(self, keys)
+
+    def _insert(self, patent_data):
+        # Called with self._lock held
+        key = record_key(patent_data)
+        size = estimate_size(patent_data)
+        entry = self._entries.get(key)
+        if entry:
+            self._total_bytes -= entry["size"]
+            entry["data"] = patent_data
+            entry["size"] = size
+        else:
+            entry = {"data": patent_data, "size": size, "refs": 0, "hits": 0}
+            self._entries[key] = entry
+        entry["last_access"] = time.time()
+        self._entries.move_to_end(key)
+        self._total_bytes += size
+        return key
+
+    def get(self, key):
+        """
+        Returns the record for key, or None if it was never stored or has been evicted.
+        """
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            entry["hits"] += 1
+            entry["last_access"] = time.time()
+            self._entries.move_to_end(key)
+            return entry["data"]
+
+    def acquire(self, keys):
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries[key]["refs"] += 1
+
+    def release(self, keys):
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry and entry["refs"] > 0:
+                    entry["refs"] -= 1
+            self._evict()
+
+    def lease(self, keys):
+        """
+        Pins keys for as long as the returned StoreLease is alive.
+        """
+        keys = [k for k in keys if k is not None]
+        self.acquire(keys)
+        return StoreLease(self, keys)
+
+    def _evict(self):
+        # Oldest-first over unpinned entries; stops when under budget or only pinned entries remain
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key in list(self._entries):
+            entry = self._entries[key]
+            if entry["refs"] > 0:
+                continue
+            del self._entries[key]
+            self._total_bytes -= entry["size"]
+            self._evictions += 1
+            if self._total_bytes <= self.max_bytes:
+                break
+
+    def memory_report(self):
+        """
+        Summary of what the store holds, largest records first.
+        """
+        with self._lock:
+            items = [
+                {
+                    "key": key,
+                    "size_bytes": entry["size"],
+                    "refs": entry["refs"],
+                    "hits": entry["hits"],
+                    "last_access": entry["last_access"]
+                }
+                for key, entry in self._entries.items()
+            ]
+            return {
+                "entries": len(items),
+                "pinned": sum(1 for i in items if i["refs"] > 0),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self._evictions,
+                "items": sorted(items, key=lambda i: i["size_bytes"], reverse=True)
+            }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """
+    Returns the process-wide PatentStore shared by all sessions.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PatentStore()
+    return _store
@@ -0,0 +1,149 @@
+import re
+
+import pandas as pd
+
+# Event types (as scraped from Google Patents) that become date columns; the earliest date wins
+EVENT_DATE_COLUMNS = {
+    "priority": "priority_date",
+    "filed": "filing_date",
+    "publication": "publication_date",
+    "granted": "grant_date"
+}
+
+DATE_COLUMNS = ("priority_date", "filing_date", "publication_date", "grant_date", "expiration_date")
+
+CATEGORY_COLUMNS = ("status", "country", "assignee", "cpc_subclass")
+
+# Columns that hold several values joined with MULTI_SEP (filtered by substring, exploded for grouping)
+MULTI_VALUE_COLUMNS = ("assignees", "inventors", "cpc_codes", "cpc_subclasses")
+MULTI_SEP = "; "
+
+def _normalize_cpc(code):
+    return re.sub(r"\s+", "", (code or "").upper())
+
+def _event_dates(events):
+    dates = {}
+    for event in events or []:
+        date = event.get('date')
+        if not date:
+            continue
+        column = EVENT_DATE_COLUMNS.get((event.get('type') or "").lower())
+        if column is None and "expiration" in (event.get('title') or "").lower():
+            column = "expiration_date"
+        if column and (column not in dates or date < dates[column]):
+            dates[column] = date
+    return dates
+
+def _flatten(record):
+    assignees = record.get('assignees') or {}
+    current = assignees.get('current') or []
+    original = assignees.get('original') or []
+    codes = []
+    for classification in record.get('classifications', []):
+        code = _normalize_cpc(classification.get('code'))
+        if code and code not in codes:
+            codes.append(code)
+    subclasses = list(dict.fromkeys(code[:4] for code in codes if len(code) >= 4))
+
+    row = {
+        "publication_number": record.get('publication_number'),
+        "title": record.get('title'),
+        "status": record.get('status'),
+        "country": record.get('country'),
+        "assignee": (current or original or [None])[0],
+        "assignees": MULTI_SEP.join(dict.fromkeys(current + original)),
+        "inventors": MULTI_SEP.join(record.get('inventors') or []),
+        "cpc_subclass": subclasses[0] if subclasses else None,
+        "cpc_subclasses": MULTI_SEP.join(subclasses),
+        "cpc_codes": MULTI_SEP.join(codes),
+        "claim_count": len(record.get('claims') or []),
+        **dict.fromkeys(DATE_COLUMNS),
+        "url": record.get('url')
+    }
+    row.update(_event_dates(record.get('events')))
+    return row
+
+def build_table(records):
+    """
+    One row per scraped record, with status, assignees, event dates, country, CPC codes
+    and claim counts as typed columns.
+    """
+    frame = pd.DataFrame([_flatten(r) for r in records])
+    if frame.empty:
+        frame = pd.DataFrame(columns=list(_flatten({}).keys()))
+    for column in DATE_COLUMNS:
+        frame[column] = pd.to_datetime(frame[column], errors="coerce")
+    for column in CATEGORY_COLUMNS:
+        frame[column] = frame[column].astype("category")
+    frame["claim_count"] = frame["claim_count"].astype("int32")
+    return PortfolioTable(frame)
+
+class PortfolioTable:
+    """
+    Column-oriented view of a portfolio. Filters, sorts and group-bys are vectorised pandas
+    operations; every method returns a new table (or a summary DataFrame) and leaves this one as is.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def publication_numbers(self):
+        return self.frame["publication_number"].tolist()
+
+    def filter(self, status=None, country=None, assignee=None, cpc_prefix=None, text=None,
+               priority_after=None, priority_before=None, min_claims=None):
+        """
+        Rows matching every given criterion. `status` and `country` accept a value or a list;
+        `assignee` and `text` are case-insensitive substrings; `cpc_prefix` matches any of a
+        patent's codes ('H01M', 'H01M 10/'); dates are anything pd.Timestamp accepts.
+        """
+        frame = self.frame
+        mask = pd.Series(True, index=frame.index)
+        if status:
+            mask &= frame["status"].isin([status] if isinstance(status, str) else status)
+        if country:
+            mask &= frame["country"].isin([country] if isinstance(country, str) else country)
+        if assignee:
+            mask &= frame["assignees"].str.contains(assignee, case=False, regex=False, na=False)
+        if cpc_prefix:
+            prefix = re.escape(_normalize_cpc(cpc_prefix).rstrip("*"))
+            mask &= frame["cpc_codes"].str.contains(rf"(?:^|{MULTI_SEP}){prefix}", regex=True, na=False)
+        if text:
+            mask &= (
+                frame["title"].str.contains(text, case=False, regex=False, na=False)
+                | frame["publication_number"].str.contains(text, case=False, regex=False, na=False)
+            )
+        if priority_after is not None:
+            mask &= frame["priority_date"] >= pd.Timestamp(priority_after)
+        if priority_before is not None:
+            mask &= frame["priority_date"] < pd.Timestamp(priority_before)
+        if min_claims is not None:
+            mask &= frame["claim_count"] >= min_claims
+        return PortfolioTable(frame[mask])
+
+    def sort(self, by, ascending=True):
+        return PortfolioTable(self.frame.sort_values(by, ascending=ascending, na_position="last", kind="stable"))
+
+    def group(self, by):
+        """
+        Patent count, claim totals and priority date range per value of `by`. Multi-valued
+        columns (assignees, cpc_subclasses, ...) count a patent once under each of its values.
+        """
+        frame = self.frame
+        if by in MULTI_VALUE_COLUMNS:
+            frame = frame.assign(**{by: frame[by].str.split(MULTI_SEP)}).explode(by)
+            frame = frame[frame[by].astype(bool)]
+        summary = frame.groupby(by, observed=True, dropna=True).agg(
+            patents=("publication_number", "count"),
+            claims=("claim_count", "sum"),
+            earliest_priority=("priority_date", "min"),
+            latest_priority=("priority_date", "max")
+        )
+        return summary.sort_values("patents", ascending=False).reset_index()
+
+    def to_csv(self):
+        return self.frame.to_csv(index=False)
@@ -0,0 +1,92 @@
+import concurrent.futures
+import re
+import threading
+
+from logic import scraper
+
+# Complete publication numbers such as US9138726B2, EP1234567A1, WO2025235535A2 (kind code optional)
+PUBLICATION_RE = re.compile(r"^[A-Z]{2}\d{5,}(?:[A-Z]\d?)?$", re.IGNORECASE)
+
+# Shared by every session; scrapes are I/O bound
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+# Speculative scrapes a session may have queued or running at once (the first inputs win),
+# so one long portfolio list can't fill the shared queue ahead of everyone else
+MAX_PREFETCHES_PER_SESSION = 8
+
+def prefetchable_url(value):
+    """
+    Normalized Google Patents URL for an input that already looks complete, else None
+    (half-typed numbers are not worth a request).
+    """
+    value = (value or "").strip()
+    if "google.com/patent" in value or PUBLICATION_RE.match(value):
+        return scraper.normalize_patent_url(scraper.build_patent_url(value))
+    return None
+
+class Prefetcher:
+    """
+    Background scrapes of the patents a session has typed but not yet submitted, keyed by
+    normalized URL (at most MAX_PREFETCHES_PER_SESSION). Inputs that disappear are cancelled:
+    queued scrapes never start, and a scrape already running finishes into the corpus but its
+    result is dropped here.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def update(self, values):
+        """
+        Makes the set of prefetched patents match `values` (raw inputs).
+        """
+        wanted = list(dict.fromkeys(url for url in map(prefetchable_url, values) if url))
+        wanted = wanted[:MAX_PREFETCHES_PER_SESSION]
+        with self._lock:
+            for url in list(self._futures):
+                if url not in wanted:
+                    self._futures.pop(url).cancel()
+            for url in wanted:
+                if url not in self._futures:
+                    self._futures[url] = _executor.submit(scraper.scrape_patent, url)
+
+    def status(self, value):
+        """
+        'ready', 'fetching', 'failed' or None (not prefetched) for a raw input.
+        """
+        url = prefetchable_url(value)
+        with self._lock:
+            future = self._futures.get(url)
+        if future is None:
+            return None
+        if not future.done():
+            return "fetching"
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            return "failed"
+        return "ready"
+
+    def result(self, url):
+        """
+        The scraped record for `url`: the prefetched one (waiting for it if still running),
+        or a fresh scrape if it was never prefetched, failed, or is still queued behind other
+        sessions' prefetches (then it is cancelled rather than waited for).
+        """
+        with self._lock:
+            future = self._futures.pop(scraper.normalize_patent_url(url), None)
+        if future is not None and not future.running() and not future.done():
+            future.cancel()
+        if future is not None and not future.cancelled():
+            try:
+                data = future.result()
+            except Exception:
+                data = None
+            if data:
+                return data
+        return scraper.scrape_patent(url)
+
+    def cancel_all(self):
+        with self._lock:
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,184 @@
+import math
+import re
+import threading
+from collections import Counter
+
+from logic import corpus
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+CPC_RE = re.compile(r"\b([A-H]\d{2}[A-Z])\s*(\d{1,4})/(\d{2,6})\b")
+
+# Common English words and patent boilerplate that carry no topical signal
+STOPWORDS = frozenset("""
+a about above according after all also an and any are as at be been being between both but by can
+claim claimed claims comprise comprises comprising configured consisting each either first for from
+further has have having herein if in including into is it its least may more most method not of on
+one or other said second such than that the their then there thereby therein these this those
+through to under upon used using via wherein which with within
+""".split())
+
+# Field weights: a term in the title says more about the invention than one deep in the claims
+FIELD_WEIGHTS = {"title": 3.0, "abstract": 2.0, "claims": 1.0, "cpc": 2.0}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Long queries (e.g. a whole patent) are cut to their most distinctive terms
+MAX_QUERY_TERMS = 64
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS and len(t) > 1]
+
+def cpc_tokens(code):
+    """
+    A CPC code and its ancestors as index terms: H01M10/052 -> cpc:h01m10/052, cpc:h01m10, cpc:h01m.
+    """
+    code = (code or "").replace(" ", "").lower()
+    if not code:
+        return []
+    tokens = [f"cpc:{code}"]
+    if "/" in code:
+        tokens.append(f"cpc:{code.split('/')[0]}")
+    if len(code) > 4:
+        tokens.append(f"cpc:{code[:4]}")
+    return tokens
+
+def _document_terms(record):
+    terms = Counter()
+    for term in tokenize(record.get('title')):
+        terms[term] += FIELD_WEIGHTS["title"]
+    for term in tokenize(record.get('abstract')):
+        terms[term] += FIELD_WEIGHTS["abstract"]
+    for claim in record.get('claims', []):
+        text = claim.get('text') if isinstance(claim, dict) else claim
+        for term in tokenize(text):
+            terms[term] += FIELD_WEIGHTS["claims"]
+    for classification in record.get('classifications', []):
+        for term in cpc_tokens(classification.get('code')):
+            terms[term] += FIELD_WEIGHTS["cpc"]
+    return terms
+
+def _query_terms(text):
+    terms = Counter(tokenize(CPC_RE.sub(" ", text)))
+    for match in CPC_RE.finditer(text):
+        for term in cpc_tokens(f"{match.group(1)}{match.group(2)}/{match.group(3)}"):
+            terms[term] += 1
+    return terms
+
+class PriorArtIndex:
+    """
+    In-memory full-text index over cached patents (title, abstract, claims, CPC codes).
+    Postings are a sparse term -> {document: weighted term frequency} map, i.e. the columns
+    of a sparse term-document matrix, so adding a patent only touches its own terms.
+    Ranking is BM25, a TF-IDF weighting with document-length normalisation that needs
+    no global re-normalisation when documents are added.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._doc_info = {}
+        self._total_length = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def add(self, record):
+        """
+        Indexes (or re-indexes) one scraped record.
+        """
+        doc_id = record.get('publication_number')
+        if not doc_id:
+            return
+        terms = _document_terms(record)
+        with self._lock:
+            self._remove(doc_id)
+            for term, weight in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = weight
+            self._doc_terms[doc_id] = terms
+            self._doc_lengths[doc_id] = sum(terms.values())
+            self._total_length += self._doc_lengths[doc_id]
+            self._doc_info[doc_id] = {
+                "publication_number": doc_id,
+                "title": record.get('title'),
+                "url": record.get('url')
+            }
+
+    def _remove(self, doc_id):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        self._doc_info.pop(doc_id, None)
+
+    def _idf(self, term):
+        n = len(self._doc_terms)
+        df = len(self._postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _search_terms(self, query_terms, k, exclude):
+        with self._lock:
+            n = len(self._doc_terms)
+            if not n or not query_terms:
+                return []
+            avg_length = self._total_length / n
+
+            weighted = sorted(
+                ((term, q_tf * self._idf(term)) for term, q_tf in query_terms.items() if term in self._postings),
+                key=lambda item: item[1],
+                reverse=True
+            )[:MAX_QUERY_TERMS]
+
+            scores = {}
+            for term, q_weight in weighted:
+                for doc_id, tf in self._postings[term].items():
+                    length_ratio = self._doc_lengths[doc_id] / avg_length
+                    scores[doc_id] = scores.get(doc_id, 0.0) + q_weight * tf * (K1 + 1) / (
+                        tf + K1 * (1 - B + B * length_ratio)
+                    )
+
+            for doc_id in exclude:
+                scores.pop(doc_id, None)
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [dict(self._doc_info[doc_id], score=round(score, 3)) for doc_id, score in ranked]
+
+    def search(self, text, k=10, exclude=()):
+        """
+        Ranked patents for a free-text query (CPC codes such as 'H01M 10/052' are understood).
+        """
+        return self._search_terms(_query_terms(text), k, exclude)
+
+    def similar_to(self, record, k=10):
+        """
+        Patents most similar to a scraped record, excluding the record itself.
+        """
+        return self._search_terms(_document_terms(record), k, exclude=[record.get('publication_number')])
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """
+    The process-wide index, built from the corpus on first use and kept up to date
+    as new scrapes are saved.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = PriorArtIndex()
+                # Listen first so scrapes landing during the initial build aren't missed
+                corpus.add_listener(index.add)
+                for record in corpus.iter_records():
+                    index.add(record)
+                _index = index
+    return _index
@@ -0,0 +1,119 @@
+import contextlib
+import contextvars
+import cProfile
+import functools
+import io
+import pstats
+import time
+
+# The recorder for the rerun in progress, or None when profiling is off (the default).
+# Script reruns each get their own; work handed to pool threads is not attributed.
+_current_run = contextvars.ContextVar("profiling_run", default=None)
+
+class RunProfile:
+    """
+    Stage timings (and optionally a cProfile capture) for one script rerun.
+    """
+
+    def __init__(self, capture=False):
+        self.started = time.perf_counter()
+        self.stages = []
+        self._depth = 0
+        self._profiler = cProfile.Profile() if capture else None
+
+    def record(self, name, start, seconds, depth):
+        self.stages.append({
+            "stage": name,
+            "start_ms": (start - self.started) * 1000,
+            "ms": seconds * 1000,
+            "depth": depth
+        })
+
+    def timeline(self):
+        """
+        Recorded stages in the order they started (nested stages follow their parent).
+        """
+        return sorted(self.stages, key=lambda entry: (entry["start_ms"], entry["depth"]))
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def totals(self):
+        """
+        {stage: (calls, total ms)}, for stages that run several times per rerun.
+        """
+        totals = {}
+        for entry in self.stages:
+            calls, ms = totals.get(entry["stage"], (0, 0.0))
+            totals[entry["stage"]] = (calls + 1, ms + entry["ms"])
+        return totals
+
+    def close(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+
+    def profile_report(self, limit=30):
+        """
+        Top functions by cumulative time from the cProfile capture, or None if not capturing.
+        """
+        if self._profiler is None:
+            return None
+        self.close()
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+def start_run(capture=False):
+    """
+    Starts recording the current rerun. `capture` also runs cProfile until profile_report().
+    """
+    run = RunProfile(capture)
+    _current_run.set(run)
+    if run._profiler is not None:
+        run._profiler.enable()
+    return run
+
+def current_run():
+    return _current_run.get()
+
+def stop_run():
+    """
+    Ends the current run (disabling its cProfile capture) and returns it, or None if none was active.
+    """
+    run = _current_run.get()
+    _current_run.set(None)
+    if run is not None:
+        run.close()
+    return run
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Times the enclosed block as `name` in the current rerun's profile (no-op when profiling is off).
+    """
+    run = _current_run.get()
+    if run is None:
+        yield
+        return
+    depth = run._depth
+    run._depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run._depth = depth
+        run.record(name, start, time.perf_counter() - start, depth)
+
+def timed(name):
+    """
+    Decorator form of stage().
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_run.get() is None:
+                return fn(*args, **kwargs)
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,5 +1,47 @@
 from fpdf import FPDF
+import concurrent.futures
 import datetime
+import hashlib
+import io
+import multiprocessing
+import threading
+import zipfile
+from collections import OrderedDict
+
+from logic import profiling
+from logic.patent_store import record_key
+
+# Recently generated reports and portfolio packs, keyed by content hash
+PDF_CACHE_SIZE = 32
+_pdf_cache = OrderedDict()
+_pdf_cache_lock = threading.Lock()
+
+# Below this many patents a portfolio pack is rendered inline; process start-up would cost more than it saves
+PARALLEL_PACK_THRESHOLD = 4
+
+# Evaluation text is written out in chunks of this many lines so long sections never sit in one buffer
+BODY_CHUNK_LINES = 200
+
+# Transliterate common Unicode characters to latin-1 equivalents
+_TRANSLITERATIONS = (
+    ('\u2013', '-'), ('\u2014', '--'), ('\u2018', "'"), ('\u2019', "'"),
+    ('\u201c', '"'), ('\u201d', '"'), ('\u2026', '...'), ('\u00b2', '2'),
+    ('\u00b3', '3'), ('\u2076', '6'), ('\u2082', '2'), ('\u2083', '3'),
+    ('\u00b0', 'deg'), ('\u2192', '->'), ('\u2264', '<='), ('\u2265', '>='),
+)
+
+def sanitize_text(text):
+    """
+    Makes text safe for the latin-1 core fonts.
+    Pure-ASCII text (most of a report) is returned as is. Otherwise the chained
+    str.replace calls are kept on purpose: each is a C-level scan, and they beat
+    a single str.translate pass on non-ASCII text (see benchmarks/bench_sanitize.py).
+    """
+    if text.isascii():
+        return text
+    for char, replacement in _TRANSLITERATIONS:
+        text = text.replace(char, replacement)
+    return text.encode('latin-1', 'replace').decode('latin-1')
 
 class PDFReport(FPDF):
     def header(self):
@@ -19,16 +61,7 @@ class PDFReport(FPDF):
         self.cell(0, 10, 'Page ' + str(self.page_no()) + '/{nb}', 0, 0, 'C')
 
     def sanitize(self, text):
-        # Transliterate common Unicode characters to latin-1 equivalents
-        replacements = {
-            '\u2013': '-', '\u2014': '--', '\u2018': "'", '\u2019': "'",
-            '\u201c': '"', '\u201d': '"', '\u2026': '...', '\u00b2': '2',
-            '\u00b3': '3', '\u2076': '6', '\u2082': '2', '\u2083': '3',
-            '\u00b0': 'deg', '\u2192': '->', '\u2264': '<=', '\u2265': '>=',
-        }
-        for char, replacement in replacements.items():
-            text = text.replace(char, replacement)
-        return text.encode('latin-1', 'replace').decode('latin-1')
+        return sanitize_text(text)
 
     def chapter_title(self, label):
         # Arial 12
@@ -40,17 +73,29 @@ class PDFReport(FPDF):
         # Line break
         self.ln(4)
 
-    def chapter_body(self, body):
-        # Read text file
+    def chapter_text(self, text):
+        # Arial 11
         self.set_font('Arial', '', 11)
         # Output justified text
-        self.multi_cell(0, 5, self.sanitize(body))
+        self.multi_cell(0, 5, self.sanitize(text))
+        # Back to the left margin so the next chunk of a long body continues below
+        self.set_x(self.l_margin)
+
+    def chapter_body(self, body):
+        self.chapter_text(body)
         # Line break
         self.ln()
 
-def create_pdf(patent_data, evaluation_text, user_context, filename="ip_report.pdf"):
+def _new_report():
     pdf = PDFReport()
     pdf.alias_nb_pages()
+    return pdf
+
+def _write_patent_report(pdf, patent_data, evaluation_text, user_context):
+    """
+    Writes the metadata, user context and evaluation sections of one patent
+    starting on a new page of an existing report.
+    """
     pdf.add_page()
     
     # Metadata Section
@@ -62,35 +107,241 @@ def create_pdf(patent_data, evaluation_text, user_context, filename="ip_report.p
     pdf.ln(5)
     
     # User Context
-    pdf.chapter_title("User Context")
-    pdf.chapter_body(user_context)
-    
-    # Evaluation Content
-    # We can try to parse the markdown a bit or just dump it textually but cleaner.
-    # For V1 let's just dump the text but filter out the markdown headers for the PDF headers
+    if user_context is not None:
+        pdf.chapter_title("User Context")
+        pdf.chapter_body(user_context)
     
-    # Simple markdown parsing for the PDF structure
-    lines = evaluation_text.split('\n')
+    _write_evaluation(pdf, evaluation_text)
+
+def _iter_lines(evaluation):
+    """
+    Yields the lines of a string, or of any iterable of lines such as an open file,
+    without materialising the whole list.
+    """
+    if not isinstance(evaluation, str):
+        for line in evaluation:
+            yield line.rstrip('\n')
+        return
+    start = 0
+    while True:
+        end = evaluation.find('\n', start)
+        if end == -1:
+            yield evaluation[start:]
+            return
+        yield evaluation[start:end]
+        start = end + 1
+
+def _write_evaluation(pdf, evaluation):
+    # Simple markdown parsing for the PDF structure: '### ' lines become chapter titles,
+    # everything else is body text with bold markers removed and bullets converted.
+    # Body text is written out every BODY_CHUNK_LINES lines, so memory stays flat on long sections.
+    body = []
+    section_open = False
+    partly_written = False
     
-    current_body = ""
+    def flush(final):
+        nonlocal section_open, partly_written
+        text = "\n".join(body)
+        body.clear()
+        if not partly_written:
+            text = text.lstrip()
+        if final:
+            if partly_written and not text.strip():
+                # Everything was already written in chunks; just close the section
+                pdf.ln()
+            else:
+                pdf.chapter_body(text.rstrip())
+            section_open = partly_written = False
+        else:
+            pdf.chapter_text(text)
+            partly_written = True
     
-    for line in lines:
+    for line in _iter_lines(evaluation):
         if line.strip().startswith('### '):
             # If we have accumulated body, print it
-            if current_body:
-                pdf.chapter_body(current_body.strip())
-                current_body = ""
+            if section_open:
+                flush(final=True)
             
             # Print new chapter title
             title = line.strip().replace('### ', '')
             pdf.chapter_title(title)
         else:
             # Accumulate text, removing bold markers for cleaner plain text
-            clean_line = line.replace('**', '').replace('* ', '- ') # Convert bullets
-            current_body += clean_line + "\n"
+            body.append(line.replace('**', '').replace('* ', '- ')) # Convert bullets
+            section_open = True
+            if len(body) >= BODY_CHUNK_LINES:
+                flush(final=False)
             
     # Print remaining body
-    if current_body:
-        pdf.chapter_body(current_body.strip())
+    if section_open:
+        flush(final=True)
 
+@profiling.timed("create_pdf")
+def create_pdf(patent_data, evaluation_text, user_context, filename="ip_report.pdf"):
+    pdf = _new_report()
+    _write_patent_report(pdf, patent_data, evaluation_text, user_context)
     return bytes(pdf.output(dest='S'))
+
+def write_pdf(output, patent_data, evaluation, user_context):
+    """
+    Variant of create_pdf that writes the report to `output` (a path or binary file-like object)
+    instead of returning it. `evaluation` may be a string or any iterable of lines (e.g. an open
+    file) and is laid out chunk by chunk; fpdf2 still assembles the finished document in one
+    buffer, which is written out as is without another copy.
+    """
+    pdf = _new_report()
+    _write_patent_report(pdf, patent_data, evaluation, user_context)
+    pdf.output(output)
+
+def _member_summary(patent_data):
+    # Only what the report prints; keeps the payload sent to worker processes small
+    return {
+        'title': patent_data.get('title') or 'Unknown',
+        'publication_number': patent_data.get('publication_number') or 'N/A',
+        'abstract': patent_data.get('abstract') or ''
+    }
+
+def _member_evaluation_text(member, evaluation_text):
+    if evaluation_text:
+        return evaluation_text
+    return (
+        "### Abstract\n"
+        f"{member['abstract']}\n"
+        "### Evaluation\n"
+        "No individual evaluation was run for this patent."
+    )
+
+def _render_member_pdf(member, evaluation_text, user_context):
+    return create_pdf(member, _member_evaluation_text(member, evaluation_text), user_context)
+
+def _render_combined_pdf(members, member_evals, user_context, portfolio_evaluation):
+    pdf = _new_report()
+    
+    # Cover: portfolio-level assessment
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, f"Portfolio Report ({len(members)} patents)", 0, 1)
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(0, 5, f"Date Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 0, 1)
+    for member in members:
+        pdf.cell(0, 5, pdf.sanitize(f"- {member['publication_number']}: {member['title']}"), 0, 1)
+    pdf.ln(5)
+    pdf.chapter_title("User Context")
+    pdf.chapter_body(user_context)
+    if portfolio_evaluation:
+        _write_evaluation(pdf, portfolio_evaluation)
+    
+    # One section per patent, sharing the same document (fonts and page setup are set up once)
+    for member, evaluation_text in zip(members, member_evals):
+        _write_patent_report(pdf, member, _member_evaluation_text(member, evaluation_text), None)
+    
+    return bytes(pdf.output(dest='S'))
+
+def create_portfolio_pack(patent_list, evaluations, user_context, portfolio_evaluation=None, max_workers=None, output=None):
+    """
+    Renders one PDF per patent plus a combined portfolio report as a zip.
+    `evaluations` maps record_key (publication number, else URL) -> evaluation markdown; patents without one get
+    their abstract instead. Larger portfolios are rendered in a process pool.
+    If `output` (a path or binary file-like object) is given, each PDF is written into the
+    zip as soon as it is rendered and nothing is returned; otherwise the zip bytes are returned.
+    """
+    members = [_member_summary(p) for p in patent_list]
+    # Looked up on the full records: the summaries show 'N/A' for a missing number
+    member_evals = [evaluations.get(record_key(p)) for p in patent_list]
+    target = io.BytesIO() if output is None else output
+    
+    with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as archive:
+        if len(members) < PARALLEL_PACK_THRESHOLD:
+            archive.writestr("Portfolio_Report.pdf", _render_combined_pdf(members, member_evals, user_context, portfolio_evaluation))
+            member_pdfs = (_render_member_pdf(m, e, user_context) for m, e in zip(members, member_evals))
+            _write_member_pdfs(archive, members, member_pdfs)
+        else:
+            # spawn rather than fork: the Streamlit server process is multi-threaded
+            context = multiprocessing.get_context("spawn")
+            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+                combined_future = executor.submit(_render_combined_pdf, members, member_evals, user_context, portfolio_evaluation)
+                member_pdfs = executor.map(
+                    _render_member_pdf, members, member_evals, [user_context] * len(members),
+                    chunksize=max(1, len(members) // 16)
+                )
+                _write_member_pdfs(archive, members, member_pdfs)
+                archive.writestr("Portfolio_Report.pdf", combined_future.result())
+    
+    if output is None:
+        return target.getvalue()
+
+def _write_member_pdfs(archive, members, member_pdfs):
+    # member_pdfs is consumed lazily so only the PDFs still in flight are held in memory
+    used_names = set()
+    for member, member_pdf in zip(members, member_pdfs):
+        name = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in member['publication_number'])
+        while name in used_names:
+            name += "_"
+        used_names.add(name)
+        archive.writestr(f"patents/IP_Report_{name}.pdf", member_pdf)
+
+def _cache_get(key):
+    with _pdf_cache_lock:
+        cached = _pdf_cache.get(key)
+        if cached is not None:
+            _pdf_cache.move_to_end(key)
+        return cached
+
+def _cache_put(key, data):
+    with _pdf_cache_lock:
+        _pdf_cache[key] = data
+        while len(_pdf_cache) > PDF_CACHE_SIZE:
+            _pdf_cache.popitem(last=False)
+
+def report_cache_key(patent_data, evaluation_text, user_context):
+    """
+    Hash of everything that ends up in the report (apart from the generation timestamp).
+    """
+    h = hashlib.sha256()
+    for part in (
+        patent_data.get('title'),
+        patent_data.get('publication_number'),
+        evaluation_text,
+        user_context
+    ):
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+def get_cached_pdf(patent_data, evaluation_text, user_context):
+    """
+    Returns previously generated PDF bytes for this report, or None.
+    """
+    return _cache_get(report_cache_key(patent_data, evaluation_text, user_context))
+
+def get_pdf(patent_data, evaluation_text, user_context):
+    """
+    Memoized create_pdf: builds the report once per distinct content and reuses the bytes.
+    """
+    key = report_cache_key(patent_data, evaluation_text, user_context)
+    pdf_bytes = _cache_get(key)
+    if pdf_bytes is None:
+        pdf_bytes = create_pdf(patent_data, evaluation_text, user_context)
+        _cache_put(key, pdf_bytes)
+    return pdf_bytes
+
+def portfolio_pack_cache_key(patent_list, evaluations, user_context, portfolio_evaluation=None):
+    h = hashlib.sha256()
+    for p in patent_list:
+        h.update(report_cache_key(p, evaluations.get(record_key(p)), user_context).encode('ascii'))
+    h.update(str(portfolio_evaluation).encode('utf-8'))
+    return "pack:" + h.hexdigest()
+
+def get_cached_portfolio_pack(patent_list, evaluations, user_context, portfolio_evaluation=None):
+    return _cache_get(portfolio_pack_cache_key(patent_list, evaluations, user_context, portfolio_evaluation))
+
+def get_portfolio_pack(patent_list, evaluations, user_context, portfolio_evaluation=None):
+    """
+    Memoized create_portfolio_pack.
+    """
+    key = portfolio_pack_cache_key(patent_list, evaluations, user_context, portfolio_evaluation)
+    pack = _cache_get(key)
+    if pack is None:
+        pack = create_portfolio_pack(patent_list, evaluations, user_context, portfolio_evaluation)
+        _cache_put(key, pack)
+    return pack
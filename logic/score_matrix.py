@@ -0,0 +1,219 @@
+import csv
+import io
+import math
+
+import numpy as np
+
+# Unanswered factors count as the lowest score, as on the single-patent page
+DEFAULT_SCORE = 1.0
+
+# Every factor is answered on a 1-5 scale
+MIN_SCORE = 1.0
+MAX_SCORE = 5.0
+
+class ScoreMatrix:
+    """
+    IPScore answers for many patents: a (patents x factors) float matrix plus a
+    (factors x categories) averaging matrix, so category aggregates, weighted
+    overall scores, rankings and percentiles are each a single vectorized step.
+    """
+
+    def __init__(self, factor_codes, factor_categories, patent_ids=(), scores=None, imported_ids=()):
+        self.factor_codes = tuple(factor_codes)
+        self.factor_categories = tuple(factor_categories)
+        self._factor_index = {code: i for i, code in enumerate(self.factor_codes)}
+        self.categories = tuple(sorted(set(self.factor_categories)))
+
+        # Column j of _category_weights averages the factors of category j
+        membership = np.zeros((len(self.factor_codes), len(self.categories)))
+        for i, cat in enumerate(self.factor_categories):
+            membership[i, self.categories.index(cat)] = 1.0
+        counts = membership.sum(axis=0)
+        self._category_weights = membership / np.where(counts == 0, 1, counts)
+
+        self.patent_ids = []
+        self._patent_index = {}
+        self.scores = np.empty((0, len(self.factor_codes)))
+        self._aggregates = None
+        # Rows that came from import_csv rather than from the loaded patents
+        self.imported_ids = set(imported_ids)
+
+        if patent_ids:
+            self.add_patents(patent_ids)
+        if scores is not None:
+            self.scores[:] = scores
+
+    @classmethod
+    def from_questions(cls, questions, patent_ids=()):
+        """
+        Builds an empty matrix for questionnaire entries with `code` and `category` attributes.
+        """
+        return cls([q.code for q in questions], [q.category for q in questions], patent_ids)
+
+    def __len__(self):
+        return len(self.patent_ids)
+
+    def _invalidate(self):
+        self._aggregates = None
+
+    def add_patents(self, patent_ids, default=DEFAULT_SCORE):
+        """
+        Appends rows for patents not yet in the matrix. Returns the ids actually added.
+        """
+        new_ids = []
+        seen = set()
+        for pid in patent_ids:
+            if pid not in self._patent_index and pid not in seen:
+                seen.add(pid)
+                new_ids.append(pid)
+        if not new_ids:
+            return []
+
+        start = len(self.patent_ids)
+        for offset, pid in enumerate(new_ids):
+            self._patent_index[pid] = start + offset
+        self.patent_ids.extend(new_ids)
+        self.scores = np.vstack([self.scores, np.full((len(new_ids), len(self.factor_codes)), default)])
+        self._invalidate()
+        return new_ids
+
+    def remove_patents(self, patent_ids):
+        """
+        Drops the rows of the given patents (ids without a row are ignored).
+        """
+        self.imported_ids.difference_update(patent_ids)
+        drop = {self._patent_index[pid] for pid in patent_ids if pid in self._patent_index}
+        if not drop:
+            return
+        keep = [i for i in range(len(self.patent_ids)) if i not in drop]
+        self.scores = self.scores[keep]
+        self.patent_ids = [self.patent_ids[i] for i in keep]
+        self._patent_index = {pid: i for i, pid in enumerate(self.patent_ids)}
+        self._invalidate()
+
+    def set_scores(self, patent_id, scores):
+        """
+        Sets factor scores ({code: score}) for one patent, adding its row if needed.
+        Unknown factor codes are ignored.
+        """
+        if patent_id not in self._patent_index:
+            self.add_patents([patent_id])
+        row = self._patent_index[patent_id]
+        for code, value in scores.items():
+            col = self._factor_index.get(code)
+            if col is not None and value is not None:
+                self.scores[row, col] = float(value)
+        self._invalidate()
+
+    def row(self, patent_id):
+        """
+        Factor scores of one patent as {code: int}, or {} if the patent has no row.
+        """
+        i = self._patent_index.get(patent_id)
+        if i is None:
+            return {}
+        return {code: int(round(v)) for code, v in zip(self.factor_codes, self.scores[i])}
+
+    def category_aggregates(self):
+        """
+        (patents x categories) array of category averages, in self.categories order.
+        """
+        if self._aggregates is None:
+            self._aggregates = self.scores @ self._category_weights
+        return self._aggregates
+
+    def _weight_vector(self, weights):
+        if not weights:
+            w = np.ones(len(self.categories))
+        else:
+            w = np.array([float(weights.get(cat, 0.0)) for cat in self.categories])
+        total = w.sum()
+        return w / total if total > 0 else np.full(len(self.categories), 1.0 / max(len(self.categories), 1))
+
+    def overall(self, weights=None):
+        """
+        Weighted overall score per patent. `weights` maps category -> weight (equal if omitted).
+        """
+        return self.category_aggregates() @ self._weight_vector(weights)
+
+    def rankings(self, weights=None):
+        """
+        Rank per patent (1 = highest overall score; ties keep matrix order).
+        """
+        order = np.argsort(-self.overall(weights), kind='stable')
+        ranks = np.empty(len(order), dtype=int)
+        ranks[order] = np.arange(1, len(order) + 1)
+        return ranks
+
+    def percentiles(self, weights=None):
+        """
+        Percentile of each patent's overall score within the matrix (0-100; tied scores share a value).
+        """
+        overall = self.overall(weights)
+        n = len(overall)
+        if n == 0:
+            return np.array([])
+        if n == 1:
+            return np.array([100.0])
+        sorted_scores = np.sort(overall)
+        below = np.searchsorted(sorted_scores, overall, side='left')
+        return below / (n - 1) * 100.0
+
+    def top(self, n, weights=None):
+        """
+        Ids of the n best patents by overall score.
+        """
+        order = np.argsort(-self.overall(weights), kind='stable')[:n]
+        return [self.patent_ids[i] for i in order]
+
+    def to_csv(self):
+        """
+        Exports the matrix as CSV: one row per patent, one column per factor code.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["patent"] + list(self.factor_codes))
+        for pid, row in zip(self.patent_ids, self.scores):
+            writer.writerow([pid] + [f"{v:g}" for v in row])
+        return buffer.getvalue()
+
+    def import_csv(self, text):
+        """
+        Merges scores from CSV produced by to_csv (or any sheet with a 'patent' column and
+        factor-code columns). Unknown columns are ignored, missing or empty cells keep their values.
+        Non-numeric cells (NaN included) are skipped and out-of-range scores are clamped to
+        MIN_SCORE..MAX_SCORE. Returns (number of patents read, list of problems found).
+        """
+        reader = csv.DictReader(io.StringIO(text))
+        rows = []
+        problems = []
+        for record in reader:
+            pid = (record.pop("patent", None) or "").strip()
+            if not pid:
+                continue
+            scores = {}
+            for code, value in record.items():
+                code = (code or "").strip()
+                value = value.strip() if isinstance(value, str) else ""
+                if code not in self._factor_index or not value:
+                    continue
+                try:
+                    score = float(value)
+                except ValueError:
+                    score = math.nan
+                if not math.isfinite(score):
+                    problems.append(f"{pid} / {code}: {value!r} is not a number, skipped")
+                    continue
+                if not MIN_SCORE <= score <= MAX_SCORE:
+                    clamped = min(max(score, MIN_SCORE), MAX_SCORE)
+                    problems.append(f"{pid} / {code}: {value} is outside {MIN_SCORE:g}-{MAX_SCORE:g}, set to {clamped:g}")
+                    score = clamped
+                scores[code] = score
+            rows.append((pid, scores))
+
+        # New patents are appended in one step (add_patents copies the whole matrix)
+        self.add_patents([pid for pid, _ in rows])
+        for pid, scores in rows:
+            self.set_scores(pid, scores)
+            self.imported_ids.add(pid)
+        return len(rows), problems
@@ -1,8 +1,42 @@
 import requests
 from bs4 import BeautifulSoup
+import os
 import re
 import sys
 
+from logic import corpus, profiling
+from logic.singleflight import SingleFlight
+
+# Overridable so tests and the load-test harness can point the scraper at a local stand-in
+PATENTS_BASE_URL = os.environ.get("IP_EVAL_PATENTS_BASE_URL", "https://patents.google.com").rstrip('/')
+
+def build_patent_url(value):
+    """
+    Turns a publication number (e.g. US9138726B2) or a Google Patents URL
+    into the URL that scrape_patent expects.
+    """
+    if not value or not value.strip():
+        return None
+    value = value.strip()
+    if "google.com/patent" in value or value.startswith(f"{PATENTS_BASE_URL}/patent/"):
+        return value
+    return f"{PATENTS_BASE_URL}/patent/{value}"
+
+def normalize_patent_url(url):
+    """
+    Canonical form of a Google Patents URL used to recognise identical requests:
+    no query/fragment, no trailing slash or language suffix, upper-case publication number.
+    """
+    url = url.strip().split('#', 1)[0].split('?', 1)[0].rstrip('/')
+    url = re.sub(r'^http://(?=[^/]*patents\.google\.com)', 'https://', url, flags=re.IGNORECASE)
+    match = re.match(r'^(https://[^/]*patents\.google\.com)/patent/([^/]+)(?:/[a-z]{2})?$', url, re.IGNORECASE)
+    if match:
+        return f"{match.group(1).lower()}/patent/{match.group(2).upper()}"
+    return url
+
+# Concurrent scrapes of the same patent share one request
+_scrape_flight = SingleFlight()
+
 def clean_text(tag):
     """
     Extracts text from a BeautifulSoup tag, converting <sub> and <sup> 
@@ -30,14 +64,26 @@ def clean_text(tag):
         
     return tag.get_text(strip=True)
 
+@profiling.timed("scrape")
 def scrape_patent(url):
     """
     Scrapes a Google Patent page and returns a dictionary of the organized data.
+    Identical requests already in flight (same normalized URL) are coalesced into one.
     """
     # Basic validation
-    if not url or "patents.google.com" not in url:
+    if not url or ("patents.google.com" not in url and not url.startswith(PATENTS_BASE_URL)):
         return None
 
+    return _scrape_flight.do(normalize_patent_url(url), _scrape_and_cache, url)
+
+def _scrape_and_cache(url):
+    data = _scrape_patent(url)
+    if data and data.get('publication_number'):
+        # Keep every scrape in the local corpus (feeds the offline prior-art index)
+        corpus.save_record(data)
+    return data
+
+def _scrape_patent(url):
     try:
         response = requests.get(url)
         response.raise_for_status()
@@ -0,0 +1,122 @@
+import json
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+
+# Saved evaluation workspaces, one .ipsnap file each
+SNAPSHOT_DIR = os.environ.get(
+    "IP_EVAL_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "snapshots")
+)
+
+# File layout:
+#   8 bytes   MAGIC
+#   2 bytes   format version (big-endian)
+#   4 bytes   header length N
+#   N bytes   header: UTF-8 JSON metadata (id, name, created_at, patents, ...), uncompressed so
+#             the browser can list snapshots without inflating them
+#   rest      payload: zlib-compressed UTF-8 JSON workspace
+MAGIC = b"IPEVSNAP"
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct(">8sHI")
+
+class SnapshotError(ValueError):
+    pass
+
+def dumps(workspace, metadata):
+    header = json.dumps(metadata, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    payload = zlib.compress(json.dumps(workspace, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+    return _PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)) + header + payload
+
+def _split(data):
+    if len(data) < _PREFIX.size:
+        raise SnapshotError("Not a snapshot file")
+    magic, version, header_length = _PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("Not a snapshot file")
+    if version > FORMAT_VERSION:
+        raise SnapshotError(f"Snapshot format {version} is newer than this version of the tool ({FORMAT_VERSION})")
+    header_end = _PREFIX.size + header_length
+    return json.loads(data[_PREFIX.size:header_end].decode("utf-8")), data[header_end:]
+
+def loads(data):
+    """
+    (metadata, workspace) from snapshot bytes.
+    """
+    metadata, payload = _split(data)
+    try:
+        workspace = json.loads(zlib.decompress(payload).decode("utf-8"))
+    except (zlib.error, ValueError) as e:
+        raise SnapshotError(f"Corrupt snapshot: {e}") from e
+    return metadata, workspace
+
+def _path(snapshot_id):
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", snapshot_id or ""):
+        raise SnapshotError(f"Invalid snapshot id: {snapshot_id!r}")
+    return os.path.join(SNAPSHOT_DIR, f"{snapshot_id}.ipsnap")
+
+def save_snapshot(workspace, name, patents=()):
+    """
+    Writes a workspace to disk and returns its metadata. `patents` are the publication
+    numbers it references (listed in the browser; the records themselves stay in the corpus).
+    """
+    created_at = time.time()
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", name).strip("-")[:40] or "snapshot"
+    snapshot_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(created_at))}-{slug}"
+    metadata = {
+        "id": snapshot_id,
+        "name": name,
+        "created_at": created_at,
+        "patents": list(patents)
+    }
+    data = dumps(workspace, metadata)
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = _path(snapshot_id)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return dict(metadata, size_bytes=len(data))
+
+def load_snapshot(snapshot_id):
+    """
+    (metadata, workspace) of a saved snapshot.
+    """
+    try:
+        with open(_path(snapshot_id), 'rb') as f:
+            return loads(f.read())
+    except OSError as e:
+        raise SnapshotError(f"Cannot read snapshot {snapshot_id}: {e}") from e
+
+def list_snapshots():
+    """
+    Metadata of every saved snapshot, newest first. Only the headers are read.
+    """
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    snapshots = []
+    for name in os.listdir(SNAPSHOT_DIR):
+        if not name.endswith(".ipsnap"):
+            continue
+        path = os.path.join(SNAPSHOT_DIR, name)
+        try:
+            with open(path, 'rb') as f:
+                prefix = f.read(_PREFIX.size)
+                _, _, header_length = _PREFIX.unpack(prefix)
+                metadata, _ = _split(prefix + f.read(header_length))
+            metadata["size_bytes"] = os.path.getsize(path)
+            snapshots.append(metadata)
+        except (OSError, struct.error, ValueError) as e:
+            print(f"Skipping unreadable snapshot {name}: {e}", file=sys.stderr)
+    return sorted(snapshots, key=lambda m: m.get("created_at", 0), reverse=True)
+
+def delete_snapshot(snapshot_id):
+    try:
+        os.remove(_path(snapshot_id))
+        return True
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,351 @@
+import contextlib
+import contextvars
+import datetime
+import functools
+import os
+import sqlite3
+import sys
+import threading
+import time
+import tomllib
+
+from logic import model_routing
+
+# Every model call is logged here (tokens, latency, estimated cost) and the budgets are checked
+# against it, so totals survive restarts and are shared by the app, the CLI and the job API.
+USAGE_DB = os.environ.get(
+    "IP_EVAL_USAGE_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "usage.sqlite3")
+)
+
+# USD per million tokens (input, output); override or extend with [pricing.<model>] in models.toml
+DEFAULT_PRICING = {
+    "gpt-5": (1.25, 10.0),
+    "gpt-5-mini": (0.25, 2.0),
+    "gpt-5-nano": (0.05, 0.4),
+}
+
+# Token budgets (0 = unlimited); override with [budgets] in models.toml or e.g. IP_EVAL_BUDGET_SESSION_TOKENS.
+# Past `degrade_at` of a budget, calls switch to the site's fallback model with a trimmed context;
+# at 100% they are refused. A session id is new on every page reload, so `user_daily_tokens`
+# (per signed-in user or client IP, since local midnight) is what stops one heavy user from
+# using up `daily_tokens` for everyone.
+DEFAULT_BUDGETS = {
+    "session_tokens": 2_000_000,
+    "user_daily_tokens": 5_000_000,
+    "job_tokens": 10_000_000,
+    "daily_tokens": 50_000_000,
+    "degrade_at": 0.8,
+}
+
+# Tokens reserved for a call before it is made, when the request doesn't cap its completion
+DEFAULT_COMPLETION_ESTIMATE = 8000
+
+# Which session / user / job / patent the calls in the current context are charged to
+_attribution = contextvars.ContextVar("usage_attribution", default={})
+
+# Estimated tokens of the calls in flight in this process: {id: (attribution, tokens)}
+_reservations = {}
+_reservations_lock = threading.RLock()
+
+_db_lock = threading.Lock()
+_connection = None
+_config = None
+_config_lock = threading.Lock()
+
+class BudgetExceeded(RuntimeError):
+    pass
+
+def _load_config(path=model_routing.CONFIG_PATH):
+    try:
+        with open(path, 'rb') as f:
+            config = tomllib.load(f)
+    except FileNotFoundError:
+        config = {}
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        print(f"Error reading usage config {path}: {e}", file=sys.stderr)
+        config = {}
+
+    pricing = dict(DEFAULT_PRICING)
+    for model, table in config.get("pricing", {}).items():
+        pricing[model] = (float(table.get("input", 0)), float(table.get("output", 0)))
+
+    budgets = dict(DEFAULT_BUDGETS)
+    budgets.update({k: v for k, v in config.get("budgets", {}).items() if k in DEFAULT_BUDGETS})
+    for name in DEFAULT_BUDGETS:
+        value = os.environ.get(f"IP_EVAL_BUDGET_{name.upper()}")
+        if value:
+            try:
+                budgets[name] = float(value)
+            except ValueError:
+                print(f"Ignoring invalid IP_EVAL_BUDGET_{name.upper()}={value!r}", file=sys.stderr)
+    return pricing, budgets
+
+def _get_config():
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = _load_config()
+    return _config
+
+def get_budgets():
+    return dict(_get_config()[1])
+
+def _connect():
+    # Called with _db_lock held
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(USAGE_DB) or ".", exist_ok=True)
+        connection = sqlite3.connect(USAGE_DB, timeout=10, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS calls (
+                ts REAL NOT NULL,
+                session TEXT,
+                user TEXT,
+                job TEXT,
+                patent TEXT,
+                site TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                latency_ms REAL NOT NULL,
+                cost_usd REAL NOT NULL,
+                degraded INTEGER NOT NULL DEFAULT 0,
+                error TEXT
+            )""")
+        # Ledgers created before failed calls and users were recorded
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(calls)")]
+        for column in ("error", "user"):
+            if column not in columns:
+                connection.execute(f"ALTER TABLE calls ADD COLUMN {column} TEXT")
+        for column in ("ts", "session", "user", "job"):
+            connection.execute(f"CREATE INDEX IF NOT EXISTS calls_{column} ON calls ({column})")
+        connection.commit()
+        _connection = connection
+    return _connection
+
+def _query(sql, params=()):
+    try:
+        with _db_lock:
+            return _connect().execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        print(f"Usage ledger unavailable: {e}", file=sys.stderr)
+        return []
+
+# --- Attribution ---
+
+@contextlib.contextmanager
+def scope(**fields):
+    """
+    Charges the model calls made inside the block to `session`, `user`, `job` and/or `patent`
+    (on top of the enclosing scope).
+    """
+    token = _attribution.set({**_attribution.get(), **{k: v for k, v in fields.items() if v}})
+    try:
+        yield
+    finally:
+        _attribution.reset(token)
+
+def set_session(session_id, user=None):
+    """
+    Charges the rest of the current context (a Streamlit rerun) to one browser session and,
+    if known, the user behind it.
+    """
+    _attribution.set({k: v for k, v in (("session", session_id), ("user", user)) if v})
+
+def current():
+    return dict(_attribution.get())
+
+def propagate(fn):
+    """
+    Wraps `fn` to run under the caller's attribution, for work handed to pool threads.
+    """
+    fields = _attribution.get()
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with scope(**fields):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def per_patent(fn):
+    """
+    Decorator for functions whose first argument is a patent record: their calls are charged to it.
+    """
+    @functools.wraps(fn)
+    def wrapper(patent_data, *args, **kwargs):
+        with scope(patent=(patent_data or {}).get("publication_number")):
+            return fn(patent_data, *args, **kwargs)
+    return wrapper
+
+# --- Recording ---
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    pricing = _get_config()[0]
+    # Dated snapshots (gpt-5-mini-2025-08-07) are priced like their base model
+    rates = pricing.get(model) or next(
+        (pricing[name] for name in sorted(pricing, key=len, reverse=True) if model.startswith(f"{name}-")), None
+    )
+    if rates is None:
+        return 0.0
+    return (prompt_tokens * rates[0] + completion_tokens * rates[1]) / 1_000_000
+
+def record(site, model, usage, seconds, degraded=False, error=None):
+    """
+    Logs one API call. `usage` is the response's usage object (None if the API sent none or
+    the call failed); `error` names the exception of a failed call (timeouts included).
+    The call is charged to the current attribution only: when analysis coalesces identical
+    concurrent calls (_completion_flight), the caller that made the request pays for it and
+    the sessions that shared its result are not charged.
+    """
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    fields = _attribution.get()
+    try:
+        with _db_lock:
+            connection = _connect()
+            connection.execute(
+                "INSERT INTO calls (ts, session, user, job, patent, site, model, prompt_tokens, completion_tokens, "
+                "latency_ms, cost_usd, degraded, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    time.time(), fields.get("session"), fields.get("user"), fields.get("job"), fields.get("patent"), site, model,
+                    prompt_tokens, completion_tokens, seconds * 1000,
+                    estimate_cost(model, prompt_tokens, completion_tokens), int(degraded), error
+                )
+            )
+            connection.commit()
+    except sqlite3.Error as e:
+        print(f"Could not record usage of {site}: {e}", file=sys.stderr)
+
+# --- Reporting ---
+
+_TOTALS = (
+    "COUNT(*), COALESCE(SUM(prompt_tokens), 0), COALESCE(SUM(completion_tokens), 0), "
+    "COALESCE(SUM(cost_usd), 0), COALESCE(AVG(latency_ms), 0), COALESCE(SUM(degraded), 0), "
+    "COALESCE(SUM(error IS NOT NULL), 0)"
+)
+_GROUP_COLUMNS = ("session", "user", "job", "patent", "site", "model")
+
+def _where(session=None, job=None, patent=None, since=None, user=None):
+    clauses, params = [], []
+    for column, value in (("session", session), ("user", user), ("job", job), ("patent", patent)):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if since:
+        clauses.append("ts >= ?")
+        params.append(since)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def _row(values):
+    calls, prompt_tokens, completion_tokens, cost, latency, degraded, failed = values
+    return {
+        "calls": calls,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "tokens": prompt_tokens + completion_tokens,
+        "cost_usd": round(cost, 4),
+        "avg_latency_ms": round(latency),
+        "degraded_calls": degraded,
+        "failed_calls": failed
+    }
+
+def totals(session=None, job=None, patent=None, since=None, user=None):
+    """
+    Aggregated usage of the matching calls (all calls if no filter is given).
+    """
+    where, params = _where(session, job, patent, since, user)
+    rows = _query(f"SELECT {_TOTALS} FROM calls{where}", params)
+    return _row(rows[0] if rows else (0, 0, 0, 0, 0, 0, 0))
+
+def breakdown(by, session=None, job=None, patent=None, since=None, user=None):
+    """
+    Aggregated usage per `by` (session, user, job, patent, site or model), most tokens first.
+    """
+    if by not in _GROUP_COLUMNS:
+        raise ValueError(f"Cannot group usage by {by!r}")
+    where, params = _where(session, job, patent, since, user)
+    rows = _query(
+        f"SELECT {by}, {_TOTALS} FROM calls{where} GROUP BY {by} "
+        f"ORDER BY SUM(prompt_tokens + completion_tokens) DESC",
+        params
+    )
+    return [{by: row[0] or "-", **_row(row[1:])} for row in rows]
+
+def start_of_day():
+    return datetime.datetime.combine(datetime.date.today(), datetime.time()).timestamp()
+
+# --- Budgets ---
+
+def _reserved(**match):
+    # Called with _reservations_lock held: tokens reserved by in-flight calls matching every field
+    return sum(
+        tokens for fields, tokens in _reservations.values()
+        if all(fields.get(k) == v for k, v in match.items())
+    )
+
+def budget_status():
+    """
+    [(budget name, tokens used, limit)] for the budgets that apply to the current attribution.
+    Tokens reserved by calls still in flight in this process count as used.
+    """
+    budgets = get_budgets()
+    fields = _attribution.get()
+    today = start_of_day()
+    with _reservations_lock:
+        status = []
+        if budgets["daily_tokens"]:
+            status.append(("daily", totals(since=today)["tokens"] + _reserved(), budgets["daily_tokens"]))
+        if fields.get("user") and budgets["user_daily_tokens"]:
+            used = totals(user=fields["user"], since=today)["tokens"] + _reserved(user=fields["user"])
+            status.append(("user daily", used, budgets["user_daily_tokens"]))
+        if fields.get("session") and budgets["session_tokens"]:
+            used = totals(session=fields["session"])["tokens"] + _reserved(session=fields["session"])
+            status.append(("session", used, budgets["session_tokens"]))
+        if fields.get("job") and budgets["job_tokens"]:
+            used = totals(job=fields["job"])["tokens"] + _reserved(job=fields["job"])
+            status.append(("job", used, budgets["job_tokens"]))
+        return status
+
+def check_budget():
+    """
+    "ok", "degrade" or "refuse" for the next call in the current context, with a reason.
+    """
+    degrade_at = get_budgets()["degrade_at"]
+    level, reason = "ok", None
+    for name, used, limit in budget_status():
+        if used >= limit:
+            return "refuse", f"The {name} token budget ({int(limit):,}) is used up."
+        if used >= degrade_at * limit:
+            level, reason = "degrade", f"{used / limit:.0%} of the {name} token budget is used."
+    return level, reason
+
+def estimate_tokens(messages, max_tokens=None):
+    """
+    Rough token count of a call before it is made: ~4 characters per prompt token plus the
+    completion cap (or DEFAULT_COMPLETION_ESTIMATE).
+    """
+    chars = sum(len(m.get("content") or "") for m in messages if isinstance(m.get("content"), str))
+    return chars // 4 + (max_tokens or DEFAULT_COMPLETION_ESTIMATE)
+
+@contextlib.contextmanager
+def reserve(tokens):
+    """
+    Checks the budgets and reserves `tokens` for a call in one step, so concurrent calls
+    (e.g. the members of a portfolio) see each other instead of all passing the same check.
+    Yields check_budget()'s (level, reason); nothing is reserved when the call is refused.
+    The reservation is dropped when the block exits, after the call has been recorded.
+    Reservations are per process, so the app and a CLI run can still overshoot together by
+    the calls they have in flight, as can calls whose real usage exceeds the estimate.
+    """
+    with _reservations_lock:
+        level, reason = check_budget()
+        reservation = object()
+        if level != "refuse":
+            _reservations[reservation] = (dict(_attribution.get()), tokens)
+    try:
+        yield level, reason
+    finally:
+        with _reservations_lock:
+            _reservations.pop(reservation, None)
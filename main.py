@@ -1,25 +1,90 @@
+import uuid
+
 import streamlit as st
 
 # Import logic modules
-from logic import scraper
+# Heavy modules (scraper, report_generator, ip_score, tools) are imported inside the
+# branches that use them so a rerun only pays for the page being shown.
 from logic import analysis
+from logic import patent_store
+from logic import profiling
+from logic import usage
+from ui import dev_panel
 from ui import layout
+from ui import state
+from ui import usage_panel
 
 # Page Config
 st.set_page_config(page_title="IP Evaluation Tool", layout="wide", initial_sidebar_state="expanded")
 
+@st.cache_resource(show_spinner=False)
+def load_api_key():
+    """Reads the OpenAI key from secrets once per process."""
+    try:
+        return st.secrets["OPENAI_API_KEY"]
+    except (FileNotFoundError, KeyError):
+        return None
+
 # --- Session State Initialization ---
-if "patent_data" not in st.session_state:
-    st.session_state["patent_data"] = None
+# Scraped records live in the process-wide patent store; the session only keeps their keys.
+if "patent_key" not in st.session_state:
+    state.clear_patents()
 if "evaluation" not in st.session_state:
     st.session_state["evaluation"] = None
 if "chat_history" not in st.session_state:
     st.session_state["chat_history"] = []
 if "api_key" not in st.session_state:
-    try:
-        st.session_state["api_key"] = st.secrets["OPENAI_API_KEY"]
-    except (FileNotFoundError, KeyError):
-        st.session_state["api_key"] = None
+    st.session_state["api_key"] = load_api_key()
+if "usage_session" not in st.session_state:
+    st.session_state["usage_session"] = uuid.uuid4().hex[:12]
+    st.session_state["usage_user"] = usage_panel.identity()
+
+# Model calls of this rerun count towards the session's token budget and the user's daily one
+usage.set_session(st.session_state["usage_session"], user=st.session_state.get("usage_user"))
+
+def evaluate_patents(main_data, portfolio_data, api_key):
+    """
+    Runs the main-patent and portfolio evaluations for the current persona and stores them in the session.
+    """
+    # Main patent
+    user_context = st.session_state.get("user_context", "")
+    st.session_state["chat_history"] = [] 
+    
+    member_evaluations = None
+    if portfolio_data and st.session_state.get("evaluate_members"):
+        # Every member (main included) gets the full evaluation, all in flight at once
+        progress_bar = st.progress(0, text=f"Evaluating {len(portfolio_data)} patents...")
+        done = []
+        def report(key, evaluation):
+            done.append(key)
+            progress_bar.progress(min(len(done) / len(portfolio_data), 1.0), text=f"Evaluated {key} ({len(done)}/{len(portfolio_data)})")
+        member_evaluations = analysis.evaluate_portfolio_members(portfolio_data, user_context, api_key, on_result=report)
+        progress_bar.empty()
+        st.session_state["evaluation"] = member_evaluations.get(patent_store.record_key(main_data))
+    else:
+        with st.spinner("Analyzing Main Patent..."):
+             evaluation_main = analysis.analyze_patent(main_data, user_context, api_key)
+             st.session_state["evaluation"] = evaluation_main
+    st.session_state["member_evaluations"] = member_evaluations
+    
+    # Portfolio (if exists)
+    if portfolio_data:
+        from logic import cpc_index, near_duplicates
+        overlap_clusters = near_duplicates.find_overlaps(portfolio_data)
+        st.session_state["portfolio_overlaps"] = overlap_clusters
+        with st.spinner("Analyzing Portfolio..."):
+             # We can pass the whole list (Main + Complements); large portfolios
+             # are assessed per CPC group first
+             evaluation_portfolio = analysis.analyze_portfolio(
+                 portfolio_data, user_context, api_key,
+                 overlap_clusters=overlap_clusters,
+                 cpc_clusters=cpc_index.cluster_portfolio(portfolio_data),
+                 member_evaluations=member_evaluations
+             )
+             st.session_state["evaluation_portfolio"] = evaluation_portfolio
+    else:
+        st.session_state["evaluation_portfolio"] = None
+        st.session_state["portfolio_overlaps"] = None
 
 # --- UI Rendering ---
 
@@ -32,114 +97,153 @@ st.title("IP Evaluation Tool")
 col_content, col_chat = st.columns([7, 3])
 
 # --- LEFT COLUMN: Main Workflow ---
-with col_content:
+with col_content, profiling.stage(f"page: {selected_page}"):
     if selected_page == "Analysis Setup":
-        main_input, comp_input, analyze_btn = layout.render_setup_page()
+        main_input, comp_input, analyze_btn, reevaluate_btn = layout.render_setup_page()
+        
+        # Start scraping whatever already looks like a complete patent number while the
+        # user finishes the form; inputs that change are cancelled on the next rerun
+        from logic import prefetch
+        if "prefetcher" not in st.session_state:
+            st.session_state["prefetcher"] = prefetch.Prefetcher()
+        prefetcher = st.session_state["prefetcher"]
+        comp_lines = [l.strip() for l in (comp_input or "").split('\n') if l.strip()]
+        prefetcher.update([main_input] + comp_lines)
+        if not analyze_btn:
+            prefetched = [v for v in [main_input] + comp_lines if prefetcher.status(v) == "ready"]
+            if prefetched:
+                st.caption(f"Prefetched: {', '.join(prefetched)}")
+        
+        if reevaluate_btn:
+            # Same patents, new persona: the cached digests make this a fraction of a full run
+            api_key = st.session_state.get("api_key")
+            main_data = state.get_patent_data()
+            if not api_key:
+                st.error("Please provide an OpenAI API Key in `.streamlit/secrets.toml`.")
+            elif main_data:
+                evaluate_patents(main_data, state.get_portfolio_data(), api_key)
+                st.info("Re-evaluation Complete. Go to 'Evaluation Results'.")
         
-        if analyze_btn:
+        elif analyze_btn:
             api_key = st.session_state.get("api_key")
             if not api_key:
                 st.error("Please provide an OpenAI API Key in `.streamlit/secrets.toml`.")
             elif not main_input:
                 st.warning("Please enter a Main Patent.")
             else:
+                from logic import scraper
+
                 # 1. Scrape Main Patent
-                if "google.com/patent" not in main_input:
-                     main_url = f"https://patents.google.com/patent/{main_input.strip()}"
-                else:
-                    main_url = main_input.strip()
+                main_url = scraper.build_patent_url(main_input)
 
-                st.session_state["patent_data"] = None # Clear old
-                st.session_state["portfolio_data"] = None
+                state.clear_patents() # Clear old
                 
                 with st.spinner(f"Scraping Main Patent..."):
-                    main_data = scraper.scrape_patent(main_url)
+                    main_data = prefetcher.result(main_url)
                 
                 if main_data:
-                    st.session_state["patent_data"] = main_data # Main is single dict
-                    
                     # 2. Scrape Complementary
                     comp_patents_data = []
-                    if comp_input:
-                        comp_lines = [l.strip() for l in comp_input.split('\n') if l.strip()]
+                    if comp_lines:
                         progress_bar = st.progress(0)
                         for i, c_in in enumerate(comp_lines):
-                            if "google.com/patent" not in c_in:
-                                c_url = f"https://patents.google.com/patent/{c_in}"
-                            else:
-                                c_url = c_in
+                            c_url = scraper.build_patent_url(c_in)
                             with st.spinner(f"Scraping Complementary {c_in}..."):
-                                c_data = scraper.scrape_patent(c_url)
+                                c_data = prefetcher.result(c_url)
                                 if c_data:
                                     comp_patents_data.append(c_data)
                             progress_bar.progress((i+1)/len(comp_lines))
                     
-                    st.session_state["portfolio_data"] = [main_data] + comp_patents_data if comp_patents_data else None
+                    portfolio_data = [main_data] + comp_patents_data if comp_patents_data else None
+                    state.set_patents(main_data, portfolio_data) # Main is single dict
 
                     st.success("Patent data retrieved!")
                     
-                    # 3. Analyze Main Patent
-                    user_context = st.session_state.get("user_context", "")
-                    st.session_state["chat_history"] = [] 
-                    
-                    with st.spinner("Analyzing Main Patent..."):
-                         evaluation_main = analysis.analyze_patent(main_data, user_context, api_key)
-                         st.session_state["evaluation"] = evaluation_main
-                    
-                    # 4. Analyze Portfolio (if exists)
-                    if st.session_state["portfolio_data"]:
-                        with st.spinner("Analyzing Portfolio..."):
-                             # We can pass the whole list (Main + Complements)
-                             evaluation_portfolio = analysis.analyze_portfolio(st.session_state["portfolio_data"], user_context, api_key)
-                             st.session_state["evaluation_portfolio"] = evaluation_portfolio
-                    else:
-                        st.session_state["evaluation_portfolio"] = None
+                    evaluate_patents(main_data, portfolio_data, api_key)
 
                     st.info("Analysis Complete. Go to 'Evaluation Results'.")
                 else:
                     st.error("Failed to scrape Main Patent.")
+                prefetcher.cancel_all()
     
     elif selected_page == "Evaluation Results":
-        # Render Results
+        # Render Results (the main patent's evaluation fills the first tabs, members get one each)
+        patent_data = state.get_patent_data()
+        member_evaluations = st.session_state.get("member_evaluations") or {}
+        member_tabs = []
+        seen = {patent_store.record_key(patent_data)} if patent_data else set()
+        for member in state.get_portfolio_data() or []:
+            key = patent_store.record_key(member)
+            if key in seen or key not in member_evaluations:
+                continue
+            seen.add(key)
+            member_tabs.append((member.get("publication_number") or "N/A", member_evaluations[key]))
         layout.render_results_page(
             st.session_state.get("evaluation"), 
-            st.session_state.get("evaluation_portfolio")
+            st.session_state.get("evaluation_portfolio"),
+            member_tabs
         )
         
         # Download PDF Section (Simple support for now, maybe just first one or raw text)
-        if st.session_state["evaluation"] and st.session_state["patent_data"]:
+        if st.session_state["evaluation"] and patent_data:
             st.divider()
             
-            # For V1 portfolio PDF, we might need updates, but let's just dump the text if multiple
-            # Or if single, use the existing logic.
-            # report_generator expects single dict.
-            
-            p_data_for_pdf = {}
-            if isinstance(st.session_state["patent_data"], list):
-                if len(st.session_state["patent_data"]) == 1:
-                    p_data_for_pdf = st.session_state["patent_data"][0]
-                else:
-                    p_data_for_pdf = {"title": "Portfolio Analysis", "publication_number": "Multiple"}
-            else:
-                 p_data_for_pdf = st.session_state["patent_data"]
+            # The main patent gets a single report; a portfolio additionally gets a
+            # zip pack (one PDF per patent plus a combined portfolio report).
+            p_data_for_pdf = patent_data
+            portfolio_data = state.get_portfolio_data()
             
             col_dl1, col_dl2 = st.columns([3, 1])
             with col_dl2:
                 from logic import report_generator
                 
-                pdf_bytes = report_generator.create_pdf(
+                # The PDF is only built when asked for, then memoized by content hash,
+                # so chat reruns on this page don't repeat the layout pass.
+                pdf_args = (
                     p_data_for_pdf,
                     st.session_state["evaluation"],
                     st.session_state.get("user_context", "No context provided.")
                 )
+                pdf_bytes = report_generator.get_cached_pdf(*pdf_args)
                 
-                st.download_button(
-                    label="Download Report as PDF",
-                    data=pdf_bytes,
-                    file_name=f"IP_Report.pdf",
-                    mime="application/pdf",
-                    use_container_width=True
-                )
+                if pdf_bytes is None:
+                    if st.button("Prepare PDF Report", use_container_width=True):
+                        with st.spinner("Building PDF..."):
+                            pdf_bytes = report_generator.get_pdf(*pdf_args)
+                
+                if pdf_bytes is not None:
+                    st.download_button(
+                        label="Download Report as PDF",
+                        data=pdf_bytes,
+                        file_name=f"IP_Report.pdf",
+                        mime="application/pdf",
+                        use_container_width=True
+                    )
+                
+                if portfolio_data:
+                    evaluations = dict(st.session_state.get("member_evaluations") or {})
+                    evaluations[patent_store.record_key(patent_data)] = st.session_state["evaluation"]
+                    pack_args = (
+                        portfolio_data,
+                        evaluations,
+                        st.session_state.get("user_context", "No context provided."),
+                        st.session_state.get("evaluation_portfolio")
+                    )
+                    pack_bytes = report_generator.get_cached_portfolio_pack(*pack_args)
+                    
+                    if pack_bytes is None:
+                        if st.button("Prepare Portfolio Pack", use_container_width=True):
+                            with st.spinner(f"Rendering {len(portfolio_data)} reports..."):
+                                pack_bytes = report_generator.get_portfolio_pack(*pack_args)
+                    
+                    if pack_bytes is not None:
+                        st.download_button(
+                            label="Download Portfolio Pack (.zip)",
+                            data=pack_bytes,
+                            file_name="IP_Portfolio_Reports.zip",
+                            mime="application/zip",
+                            use_container_width=True
+                        )
         
     elif selected_page == "Raw Data":
         # Hidden / Moved to Tools
@@ -154,11 +258,11 @@ with col_content:
         tools.render_tools_page()
 
 # --- RIGHT COLUMN: Persistent Chat ---
-with col_chat:
+with col_chat, profiling.stage("chat column"):
     layout.render_chat_interface(st.session_state["chat_history"])
     
     # Check if we have context to chat about
-    if st.session_state["evaluation"] or st.session_state["patent_data"]:
+    if st.session_state["evaluation"] or st.session_state["patent_key"]:
         if prompt := st.chat_input("Ask a question about this patent..."):
             # Append user message
             st.session_state["chat_history"].append({"role": "user", "content": prompt})
@@ -177,7 +281,7 @@ if st.session_state["chat_history"] and st.session_state["chat_history"][-1]["ro
                 
                 # Patent Context
                 # Handle list
-                p_data_obj = st.session_state["patent_data"]
+                p_data_obj = state.get_patent_data()
                 patent_context_str = ""
                 
                 if isinstance(p_data_obj, list):
@@ -208,3 +312,7 @@ if st.session_state["chat_history"] and st.session_state["chat_history"][-1]["ro
                      st.markdown(response_text)
                      st.session_state["chat_history"].append({"role": "assistant", "content": response_text})
                      st.rerun() 
+
+# Usage & budget panel, then the developer profiling panel (opt-in, see ui/dev_panel.py)
+usage_panel.finish()
+dev_panel.finish()
@@ -0,0 +1,36 @@
+"""
+Recall of the claim-overlap detector at the reporting threshold, through both the exact
+(small portfolio) and the LSH bucket path.
+"""
+import numpy as np
+
+from logic import near_duplicates
+from logic.near_duplicates import NUM_PERM, OVERLAP_THRESHOLD, OverlapDetector
+
+def _pair_signatures(rng, similarity):
+    a = rng.randint(0, 2**32, size=NUM_PERM, dtype=np.uint64).astype(np.uint32)
+    b = rng.randint(0, 2**32, size=NUM_PERM, dtype=np.uint64).astype(np.uint32)
+    shared = rng.choice(NUM_PERM, size=int(similarity * NUM_PERM), replace=False)
+    b[shared] = a[shared]
+    return a, b
+
+def _detector(pairs, similarity):
+    rng = np.random.RandomState(7)
+    detector = OverlapDetector()
+    for i in range(pairs):
+        sig_a, sig_b = _pair_signatures(rng, similarity)
+        detector.add({"publication_number": f"A{i}"}, sig=sig_a)
+        detector.add({"publication_number": f"B{i}"}, sig=sig_b)
+    return detector
+
+def test_pairs_at_threshold_are_found_through_buckets():
+    pairs = near_duplicates.EXACT_PAIRS_LIMIT
+    detector = _detector(pairs, OVERLAP_THRESHOLD)
+    found = {(a, b) for a, b, _ in detector.overlapping_pairs()}
+    assert found == {(f"A{i}", f"B{i}") for i in range(pairs)}
+
+def test_small_portfolios_compare_every_pair():
+    detector = _detector(10, OVERLAP_THRESHOLD)
+    found = {(a, b) for a, b, _ in detector.overlapping_pairs()}
+    assert found == {(f"A{i}", f"B{i}") for i in range(10)}
+    assert _detector(10, 0.3).overlapping_pairs() == []
@@ -0,0 +1,42 @@
+"""
+Pinning in the shared patent store: a record stored for a session must survive until its
+lease is released, however small the store's budget.
+"""
+import gc
+
+from logic.patent_store import PatentStore
+
+def _record(number, claims=2000):
+    return {"publication_number": number, "url": f"https://patents.google.com/patent/{number}", "claims": "x" * claims}
+
+def test_put_many_pins_records_over_budget():
+    store = PatentStore(max_bytes=1)
+    lease = store.put_many([_record("US1"), _record("US2")])
+    assert lease.keys == ("US1", "US2")
+    # Each record alone exceeds max_bytes, and other sessions keep storing
+    for i in range(10):
+        store.put(_record(f"US{100 + i}"))
+        store.put_many([_record(f"US{200 + i}")]).release()
+    assert store.get("US1") is not None
+    assert store.get("US2") is not None
+
+def test_portfolio_loop_keeps_earlier_members():
+    store = PatentStore(max_bytes=3000)
+    portfolio = [_record(f"US{i}") for i in range(5)]
+    lease = store.put_many(portfolio)
+    assert [store.get(k) for k in lease.keys] == portfolio
+
+def test_release_makes_records_evictable():
+    store = PatentStore(max_bytes=1)
+    lease = store.put_many([_record("US1")])
+    lease.release()
+    store.put(_record("US2"))
+    assert store.get("US1") is None
+    assert store.memory_report()["pinned"] == 0
+
+def test_lease_released_on_garbage_collection():
+    store = PatentStore(max_bytes=1)
+    store.put_many([_record("US1")])
+    gc.collect()
+    store.put(_record("US2"))
+    assert store.get("US1") is None
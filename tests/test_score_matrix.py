@@ -0,0 +1,29 @@
+"""
+CSV import into the IPScore matrix.
+"""
+import time
+
+from logic.score_matrix import ScoreMatrix
+
+CODES = [f"F{i}" for i in range(40)]
+
+def _matrix(patent_ids=()):
+    return ScoreMatrix(CODES, ["A"] * 20 + ["B"] * 20, patent_ids)
+
+def test_import_merges_validates_and_marks_rows():
+    matrix = _matrix(["US1"])
+    count, problems = matrix.import_csv("patent,F0,F1,F2,unknown\nUS1,4,,x,7\nUS2,9,0,2,\n")
+    assert count == 2
+    assert matrix.patent_ids == ["US1", "US2"]
+    assert matrix.row("US1")["F0"] == 4 and matrix.row("US1")["F1"] == 1
+    assert matrix.row("US2")["F0"] == 5 and matrix.row("US2")["F1"] == 1 and matrix.row("US2")["F2"] == 2
+    assert len(problems) == 3
+    assert matrix.imported_ids == {"US1", "US2"}
+
+def test_large_import_is_linear():
+    lines = ["patent," + ",".join(CODES)] + [f"P{i}," + ",".join(["3"] * len(CODES)) for i in range(5000)]
+    matrix = _matrix()
+    start = time.perf_counter()
+    count, problems = matrix.import_csv("\n".join(lines))
+    assert count == 5000 and not problems
+    assert time.perf_counter() - start < 1.0
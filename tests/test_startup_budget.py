@@ -0,0 +1,79 @@
+"""
+Guards the lazy-import work in main.py: heavy dependencies must stay out of a cold start
+and out of a plain rerun, and importing the app's own modules must stay cheap.
+
+    python -m pytest tests
+"""
+import ast
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only imported by the pages/actions that need them
+HEAVY_MODULES = ("openai", "pandas", "fpdf", "numpy")
+
+# Seconds on top of `import streamlit` for main.py's own top-level imports
+IMPORT_BUDGET = 0.5
+# Seconds for a warm rerun of the landing page
+RERUN_BUDGET = 1.0
+
+def _main_imports():
+    """
+    The modules main.py imports at top level (so new imports there are covered automatically).
+    """
+    with open(os.path.join(ROOT, "main.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            modules.extend(f"{node.module}.{alias.name}" if node.module in ("logic", "ui") else node.module for alias in node.names)
+    return [m for m in modules if m != "streamlit"]
+
+def _run(code):
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the app's usage ledger out of data/
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=120,
+            env=dict(os.environ, IP_EVAL_USAGE_DB=os.path.join(tmp, "usage.sqlite3"))
+        )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_cold_import_stays_light():
+    report = _run(f"""
+import importlib, json, sys, time
+import streamlit
+start = time.perf_counter()
+for name in {_main_imports()!r}:
+    importlib.import_module(name)
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+}}))
+""")
+    assert report["loaded"] == [], f"main.py now imports {report['loaded']} at startup"
+    assert report["seconds"] < IMPORT_BUDGET, f"app imports took {report['seconds']:.2f}s (budget {IMPORT_BUDGET}s)"
+
+def test_rerun_stays_light():
+    report = _run(f"""
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("main.py", default_timeout=60)
+app.run()
+start = time.perf_counter()
+app.run()
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "exceptions": [str(e.value) for e in app.exception],
+    "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+}}))
+""")
+    assert report["exceptions"] == []
+    assert report["loaded"] == [], f"the landing page now imports {report['loaded']}"
+    assert report["seconds"] < RERUN_BUDGET, f"rerun took {report['seconds']:.2f}s (budget {RERUN_BUDGET}s)"
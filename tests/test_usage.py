@@ -0,0 +1,54 @@
+"""
+Token budgets: per-user caps across sessions and reservations for calls in flight.
+"""
+import threading
+import types
+
+import pytest
+
+from logic import usage
+
+@pytest.fixture(autouse=True)
+def ledger(tmp_path, monkeypatch):
+    monkeypatch.setattr(usage, "USAGE_DB", str(tmp_path / "usage.sqlite3"))
+    monkeypatch.setattr(usage, "_connection", None)
+    budgets = dict(usage.DEFAULT_BUDGETS, session_tokens=20_000, user_daily_tokens=30_000, daily_tokens=0)
+    monkeypatch.setattr(usage, "_config", (dict(usage.DEFAULT_PRICING), budgets))
+    yield
+    if usage._connection is not None:
+        usage._connection.close()
+
+def _spend(tokens):
+    usage.record("evaluation", "gpt-5-mini", types.SimpleNamespace(prompt_tokens=tokens, completion_tokens=0), 0.1)
+
+def test_new_session_does_not_reset_user_budget():
+    with usage.scope(session="s1", user="ip:10.0.0.1"):
+        _spend(19_000)
+    with usage.scope(session="s2", user="ip:10.0.0.1"):
+        _spend(11_000)
+        assert usage.check_budget()[0] == "refuse"
+    with usage.scope(session="s3", user="ip:10.0.0.2"):
+        assert usage.check_budget()[0] == "ok"
+
+def test_parallel_calls_see_each_others_reservations():
+    levels = []
+    started = threading.Barrier(8)
+    # Every call holds its reservation until all of them have checked the budget
+    inside = threading.Barrier(9)
+
+    def call():
+        with usage.scope(session="s1"):
+            started.wait()
+            with usage.reserve(8_000) as (level, _):
+                levels.append(level)
+                inside.wait(5)
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    inside.wait(5)
+    for thread in threads:
+        thread.join()
+    # 0 and 8,000 reserved: ok; 16,000: degrade (80%); 24,000 and up: refuse
+    assert sorted(levels) == ["degrade"] + ["ok"] * 2 + ["refuse"] * 5
+    assert usage._reservations == {}
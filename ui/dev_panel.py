@@ -0,0 +1,92 @@
+import contextvars
+import os
+
+import streamlit as st
+
+from logic import patent_store, profiling
+
+# The sidebar container of the rerun in progress (filled in at the end of the script)
+_panel = contextvars.ContextVar("dev_panel", default=None)
+
+def is_enabled():
+    """
+    The panel is opt-in on the server: IP_EVAL_DEV_PANEL=1 shows it to everyone, and
+    IP_EVAL_DEV_PANEL=url only to visitors who open the app with ?dev=1.
+    """
+    mode = os.environ.get("IP_EVAL_DEV_PANEL")
+    return mode == "1" or (mode == "url" and st.query_params.get("dev") == "1")
+
+def begin():
+    """
+    Called from the sidebar before the page renders: starts recording this rerun if the
+    session has profiling switched on, and reserves the panel's place in the sidebar.
+    """
+    _panel.set(None)
+    # A rerun cut short by st.rerun() never reaches finish(); don't let its run (and
+    # profiler) leak into this one
+    profiling.stop_run()
+    if not is_enabled():
+        return
+    if not st.checkbox("Developer profiling", key="dev_profiling"):
+        return
+    profiling.start_run(capture=st.session_state.pop("dev_capture_next", False))
+    _panel.set(st.container())
+
+def _session_sizes():
+    sizes = []
+    for key, value in st.session_state.items():
+        size = patent_store.estimate_size(value)
+        if hasattr(value, "__dict__"):
+            size += patent_store.estimate_size(vars(value))
+        nbytes = getattr(getattr(value, "scores", None), "nbytes", 0)
+        sizes.append({"Key": str(key), "Size (KB)": round((size + nbytes) / 1024, 1)})
+    return sorted(sizes, key=lambda row: row["Size (KB)"], reverse=True)
+
+def finish():
+    """
+    Called at the very end of the script: renders this rerun's timings into the reserved panel.
+    """
+    panel = _panel.get()
+    run = profiling.stop_run()
+    if panel is None or run is None:
+        return
+
+    report = run.profile_report()
+    if report:
+        st.session_state["dev_profile_report"] = report
+
+    with panel:
+        with st.expander("Profile of this rerun", expanded=True):
+            st.metric("Rerun time", f"{run.elapsed_ms():.0f} ms")
+            st.dataframe(
+                [
+                    {"Stage": " " * entry["depth"] + entry["stage"], "Start (ms)": round(entry["start_ms"]), "Time (ms)": round(entry["ms"], 1)}
+                    for entry in run.timeline()
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+            totals = run.totals()
+            if any(calls > 1 for calls, _ in totals.values()):
+                st.caption("Totals for repeated stages")
+                st.dataframe(
+                    [{"Stage": name, "Calls": calls, "Total (ms)": round(ms, 1)} for name, (calls, ms) in totals.items() if calls > 1],
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+        with st.expander("Session state size", expanded=False):
+            sizes = _session_sizes()
+            st.caption(f"Total: {sum(row['Size (KB)'] for row in sizes):.1f} KB (scraped patents live in the shared store, not here)")
+            st.dataframe(sizes, use_container_width=True, hide_index=True)
+
+        with st.expander("cProfile", expanded=bool(report)):
+            if st.button("Profile Next Rerun", use_container_width=True):
+                st.session_state["dev_capture_next"] = True
+                st.rerun()
+            saved = st.session_state.get("dev_profile_report")
+            if saved:
+                st.code(saved, language=None)
+                st.download_button("Download Profile", saved, file_name="rerun_profile.txt", mime="text/plain")
+            else:
+                st.caption("Captures the functions of one full rerun, sorted by cumulative time.")
@@ -1,48 +1,253 @@
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
+import csv
 import os
+from dataclasses import dataclass
+from types import MappingProxyType
 
-def load_questions(csv_path):
-    """Loads questions from the CSV file."""
+from logic import profiling
+from ui import state
+
+CATEGORY_NAMES = {
+    'A': 'Legal Status',
+    'B': 'Technology',
+    'C': 'Market Conditions',
+    'D': 'Finance',
+    'E': 'Strategy'
+}
+
+# Group by category - Enforce strict unique list to prevent duplicates
+# We explicitly define the allowed categories to ensure cleaner UI and catch data errors
+CATEGORIES = tuple(sorted(CATEGORY_NAMES.values()))
+
+QUESTIONNAIRE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "IPscore-full-table.csv"
+)
+
+@dataclass(frozen=True)
+class Question:
+    code: str
+    category_code: str
+    category: str
+    question: str
+    options: tuple
+    option_scores: tuple
+
+@dataclass(frozen=True)
+class Questionnaire:
+    """
+    Parsed IPScore questionnaire. Immutable and shared by every session.
+    """
+    questions: tuple
+    by_code: MappingProxyType
+    by_category: MappingProxyType
+    question_dicts: tuple
+
+def _option_score(option_text, fallback):
+    # Options are written as "<score>: <text>"
     try:
-        df = pd.read_csv(csv_path)
-        # Structure: Factor, Question, Option 1...5
-        # Parse into a structured dict
-        categories = {
-            'A': 'Legal Status',
-            'B': 'Technology',
-            'C': 'Market Conditions',
-            'D': 'Finance',
-            'E': 'Strategy'
-        }
-        
-        questions = []
-        for _, row in df.iterrows():
-            if pd.isna(row['Factor']) or not row['Factor'].strip():
-                continue
-            
-            factor_code = str(row['Factor']).strip()
-            cat_code = factor_code[0]
-            
-            # Simple parsing options
-            options = []
-            for i in range(1, 6):
-                opt_text = row.get(f'Option {i}')
-                if pd.notna(opt_text):
-                    options.append(str(opt_text))
-            
-            questions.append({
-                "code": factor_code,
-                "category_code": cat_code,
-                "category": categories.get(cat_code, "Other"),
-                "question": row['Question'],
-                "options": options
-            })
-        return questions
-    except Exception as e:
+        return int(option_text.split(':')[0])
+    except ValueError:
+        return fallback
+
+@profiling.timed("load_questions")
+def load_questionnaire(csv_path=QUESTIONNAIRE_PATH):
+    """
+    Returns the cached questionnaire model. The CSV is parsed again only when its mtime changes.
+    """
+    try:
+        mtime = os.path.getmtime(csv_path)
+    except OSError as e:
         st.error(f"Error loading IP Score CSV: {e}")
-        return []
+        mtime = None
+    return _parse_questionnaire(csv_path, mtime)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _parse_questionnaire(csv_path, mtime):
+    questions = []
+    if mtime is not None:
+        try:
+            with open(csv_path, encoding='utf-8-sig', newline='') as f:
+                # Structure: Factor, Question, Option 1...5
+                for row in csv.DictReader(f):
+                    factor_code = (row.get('Factor') or '').strip()
+                    if not factor_code:
+                        continue
+                    cat_code = factor_code[0]
+
+                    options = tuple(row[f'Option {i}'] for i in range(1, 6) if row.get(f'Option {i}'))
+                    questions.append(Question(
+                        code=factor_code,
+                        category_code=cat_code,
+                        category=CATEGORY_NAMES.get(cat_code, "Other"),
+                        question=row['Question'],
+                        options=options,
+                        option_scores=tuple(_option_score(opt, i + 1) for i, opt in enumerate(options))
+                    ))
+        except Exception as e:
+            st.error(f"Error loading IP Score CSV: {e}")
+            questions = []
+
+    by_category = {cat: tuple(q for q in questions if q.category == cat) for cat in CATEGORIES}
+    return Questionnaire(
+        questions=tuple(questions),
+        by_code=MappingProxyType({q.code: q for q in questions}),
+        by_category=MappingProxyType(by_category),
+        question_dicts=tuple(
+            MappingProxyType({
+                "code": q.code,
+                "category_code": q.category_code,
+                "category": q.category,
+                "question": q.question,
+                "options": list(q.options)
+            })
+            for q in questions
+        )
+    )
+
+def load_questions(csv_path=QUESTIONNAIRE_PATH):
+    """Loads questions from the CSV file as a list of read-only dicts (code, category, question, options)."""
+    return list(load_questionnaire(csv_path).question_dicts)
+
+MANUAL_PATENT_ID = "Manual assessment"
+
+# Spider charts get unreadable (and slow) past a handful of traces
+MAX_COMPARED = 8
+
+def _get_score_matrix(questionnaire):
+    """
+    The session's ScoreMatrix, with a row for every patent currently loaded. Rows of patents
+    that are no longer loaded (and the manual placeholder once patents are) are dropped,
+    unless they were imported from CSV.
+    """
+    from logic.score_matrix import ScoreMatrix
+
+    matrix = st.session_state.get("ip_score_matrix")
+    factor_codes = tuple(q.code for q in questionnaire.questions)
+    if matrix is None or matrix.factor_codes != factor_codes:
+        matrix = ScoreMatrix.from_questions(questionnaire.questions)
+        st.session_state["ip_score_matrix"] = matrix
+
+    loaded = state.get_patent_ids() or [MANUAL_PATENT_ID]
+    wanted = set(loaded) | matrix.imported_ids
+    matrix.remove_patents([pid for pid in matrix.patent_ids if pid not in wanted])
+    matrix.add_patents(loaded)
+    return matrix
+
+def _render_spider_chart(matrix, patent_ids):
+    with profiling.stage("plotly figure"):
+        fig = _build_spider_chart(matrix, patent_ids)
+    st.plotly_chart(fig)
+
+def _build_spider_chart(matrix, patent_ids):
+    import plotly.graph_objects as go
+
+    aggregates = matrix.category_aggregates()
+    index = {pid: i for i, pid in enumerate(matrix.patent_ids)}
+    data_cats = list(matrix.categories) + [matrix.categories[0]] # Close the loop
+
+    fig = go.Figure()
+    for pid in patent_ids:
+        data_vals = list(aggregates[index[pid]])
+        data_vals.append(data_vals[0])
+        fig.add_trace(go.Scatterpolar(
+            r=data_vals,
+            theta=data_cats,
+            fill='toself',
+            name=pid
+        ))
+
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 5]
+            )),
+        showlegend=len(patent_ids) > 1,
+        margin=dict(t=20, b=20, l=40, r=40),
+        height=400
+    )
+    return fig
+
+def _render_portfolio_ranking(matrix):
+    with st.expander(f"Portfolio Ranking ({len(matrix)} patents)", expanded=False):
+        st.caption("Category weights for the overall score")
+        weight_cols = st.columns(len(matrix.categories))
+        weights = {
+            cat: col.number_input(cat, min_value=0.0, max_value=10.0, value=1.0, step=0.5, key=f"ip_weight_{cat}")
+            for cat, col in zip(matrix.categories, weight_cols)
+        }
+
+        aggregates = matrix.category_aggregates()
+        overall = matrix.overall(weights)
+        ranks = matrix.rankings(weights)
+        percentiles = matrix.percentiles(weights)
+
+        # Only the top rows are turned into Python objects for display
+        shown = ranks.argsort()[:200]
+        table = []
+        for i in shown:
+            entry = {"Rank": int(ranks[i]), "Patent": matrix.patent_ids[i], "Overall": round(float(overall[i]), 2),
+                     "Percentile": round(float(percentiles[i]), 1)}
+            for j, cat in enumerate(matrix.categories):
+                entry[cat] = round(float(aggregates[i, j]), 2)
+            table.append(entry)
+        st.dataframe(table, use_container_width=True, hide_index=True)
+        if len(matrix) > len(shown):
+            st.caption(f"Showing the top {len(shown)} of {len(matrix)} patents. Export the matrix for the full list.")
+
+def _render_import_export(matrix):
+    with st.expander("Import / Export Score Matrix", expanded=False):
+        st.download_button(
+            label="Export Matrix (CSV)",
+            data=matrix.to_csv(),
+            file_name="ip_score_matrix.csv",
+            mime="text/csv"
+        )
+        uploaded = st.file_uploader("Import Matrix (CSV with a 'patent' column and factor codes)", type=["csv"])
+        if uploaded is not None and st.button("Import Scores"):
+            count, problems = matrix.import_csv(uploaded.getvalue().decode("utf-8-sig"))
+            st.success(f"Imported scores for {count} patents.")
+            if problems:
+                st.warning(f"{len(problems)} cells needed attention:\n\n" + "\n".join(f"- {p}" for p in problems[:20]))
+
+def _render_auto_score(matrix, active_id):
+    """
+    Pre-fills factor answers with the LLM. Answers land in the matrix as editable defaults.
+    """
+    records = state.get_portfolio_data() or [r for r in [state.get_patent_data()] if r]
+    records = [r for r in records if (r.get('publication_number') or r.get('url')) in matrix.patent_ids]
+
+    with st.expander("Auto-score with AI", expanded=False):
+        if not records:
+            st.caption("Scrape a patent in 'Analysis Setup' to pre-fill its answers automatically.")
+            return
+        st.caption("Answers all factors per patent in one call. Review and adjust them in the form below.")
+        scope = st.radio("Pre-fill", ["Selected patent", f"All loaded patents ({len(records)})"], horizontal=True)
+        if st.button("Pre-fill Answers"):
+            api_key = st.session_state.get("api_key")
+            if not api_key:
+                st.error("Please provide an OpenAI API Key in `.streamlit/secrets.toml`.")
+                return
+            if scope == "Selected patent":
+                records = [r for r in records if (r.get('publication_number') or r.get('url')) == active_id]
+
+            from logic import analysis
+
+            progress_bar = st.progress(0)
+            results = analysis.prefill_portfolio_scores(
+                records, load_questions(), api_key,
+                on_progress=lambda done, total: progress_bar.progress(done / total)
+            )
+            for pid, scores in results.items():
+                matrix.set_scores(pid, scores)
+                # Drop the radios' remembered answers so they pick up the new defaults
+                for key in [k for k in st.session_state if str(k).startswith(f"radio_{pid}_")]:
+                    del st.session_state[key]
+
+            if len(results) < len(records):
+                st.warning(f"Pre-filled {len(results)} of {len(records)} patents; the others could not be scored.")
+            else:
+                st.rerun()
 
 def render_score_page():
     st.header("IP Score Matrix")
@@ -54,109 +259,78 @@ def render_score_page():
     )
     st.caption("Based on the [EPO IPScore methodology](https://www.epo.org/en/searching-for-patents/business/ipscore).")
 
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    csv_path = os.path.join(base_dir, "data", "IPscore-full-table.csv")
-    
-    questions = load_questions(csv_path)
-    
-    if "ip_scores" not in st.session_state:
-        st.session_state["ip_scores"] = {}
-
-    # Group by category - Enforce strict unique list to prevent duplicates
-    # We explicitly define the allowed categories to ensure cleaner UI and catch data errors
-    categories = sorted([
-        'Legal Status',
-        'Technology', 
-        'Market Conditions', 
-        'Finance', 
-        'Strategy'
-    ])
-    
+    questionnaire = load_questionnaire()
+    if not questionnaire.questions:
+        return
+
+    matrix = _get_score_matrix(questionnaire)
+    categories = CATEGORIES
+
+    active_id = st.selectbox("Patent being scored", matrix.patent_ids, key="ip_score_active")
+
     # --- 1. Results Visualization (Top) ---
-    if questions:
-        # Calculate category averages
-        cat_scores = {}
-        for cat in categories:
-            cat_qs = [q for q in questions if q['category'] == cat]
-            total = 0
-            count = 0
-            for q in cat_qs:
-                val = st.session_state["ip_scores"].get(q['code'], 1) # default 1 min
-                total += val
-                count += 1
-            cat_scores[cat] = total / count if count else 0
-        
-        # Spider Chart
-        data_vals = [cat_scores[cat] for cat in categories]
-        data_cats = list(categories)
-        
-        # Close the loop
-        data_vals.append(data_vals[0])
-        data_cats.append(data_cats[0])
-        
-        fig = go.Figure(data=go.Scatterpolar(
-            r=data_vals,
-            theta=data_cats,
-            fill='toself',
-            name='IP Score'
-        ))
-        
-        fig.update_layout(
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, 5]
-                )),
-            showlegend=False,
-            margin=dict(t=20, b=20, l=40, r=40),
-            height=400
-        )
-        
-        st.plotly_chart(fig)
-        
-        # Summary Text
-        score_avg = sum(data_vals[:-1]) / len(categories)
-        st.metric("Overall IP Score", f"{score_avg:.1f} / 5.0")
-        
-        st.divider()
+    compared = [active_id]
+    if len(matrix) > 1:
+        others = [pid for pid in matrix.top(MAX_COMPARED) if pid != active_id]
+        compared = st.multiselect(
+            "Compare with",
+            matrix.patent_ids,
+            default=[active_id] + others[:2],
+            max_selections=MAX_COMPARED
+        ) or [active_id]
+
+    # Spider Chart (from the precomputed category aggregates)
+    _render_spider_chart(matrix, compared)
+
+    # Summary Text
+    active_row = matrix.patent_ids.index(active_id)
+    col_s1, col_s2 = st.columns(2)
+    col_s1.metric("Overall IP Score", f"{matrix.overall()[active_row]:.1f} / 5.0")
+    if len(matrix) > 1:
+        col_s2.metric("Portfolio Rank", f"{matrix.rankings()[active_row]} of {len(matrix)}",
+                      help=f"Percentile: {matrix.percentiles()[active_row]:.0f}")
+        _render_portfolio_ranking(matrix)
+
+    _render_auto_score(matrix, active_id)
+    _render_import_export(matrix)
+
+    st.divider()
 
     # --- 2. Input Form (Bottom, Collapsible) ---
-    st.subheader("Assessment Questions")
+    st.subheader(f"Assessment Questions: {active_id}")
+    current_scores = matrix.row(active_id)
     with st.form("ip_score_form"):
         # Use a simple flat counter to ensure absolute key uniqueness
         # This avoids any issues with duplicate codes, categories, or loop indices
         radio_counter = 0
-        
+        new_scores = {}
+
         for cat in categories:
             with st.expander(f"{cat} Assessment", expanded=False):
-                cat_qs = [q for q in questions if q['category'] == cat]
-                
-                for q in cat_qs:
-                    current_val = st.session_state["ip_scores"].get(q['code'], 0) # default 0
-                    
+                for q in questionnaire.by_category[cat]:
+                    current_val = current_scores.get(q.code, 0) # default 0
+
                     # Initialize index
-                    idx = 0
-                    if current_val > 0:
-                        idx = current_val - 1
-                    
-                    # Safe key using flat counter
-                    unique_key = f"radio_{q['code']}_{radio_counter}"
+                    idx = q.option_scores.index(current_val) if current_val in q.option_scores else 0
+
+                    # Safe key using flat counter (and the patent, so switching patents reloads its answers)
+                    unique_key = f"radio_{active_id}_{q.code}_{radio_counter}"
                     radio_counter += 1
-                    
+
+                    # The radio returns the option index, so the score is a tuple lookup
                     selected = st.radio(
-                        f"{q['code']}: {q['question']}",
-                        options=q['options'],
-                        index=idx if idx < len(q['options']) else 0,
+                        f"{q.code}: {q.question}",
+                        options=range(len(q.options)),
+                        format_func=q.options.__getitem__,
+                        index=idx,
                         key=unique_key
                     )
-                    
-                    # Extract score
-                    try:
-                        score = int(selected.split(':')[0])
-                    except:
-                        score = 1
-                    
-                    st.session_state["ip_scores"][q['code']] = score
+
+                    new_scores[q.code] = q.option_scores[selected] if selected is not None else 1
                     st.write("") # Spacer
-        
+
         submitted = st.form_submit_button("Update Score Analysis")
+
+    if submitted:
+        matrix.set_scores(active_id, new_scores)
+        st.rerun()
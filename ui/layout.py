@@ -1,4 +1,6 @@
 import streamlit as st
+from logic import analysis
+from ui import dev_panel, usage_panel, workspace
 
 def render_sidebar():
     """
@@ -12,6 +14,9 @@ def render_sidebar():
             ["Analysis Setup", "Evaluation Results", "IP Score Matrix", "Tools & Resources"]
         )
         st.divider()
+        workspace.render_snapshot_panel()
+        usage_panel.begin()
+        dev_panel.begin()
         st.caption("IP Evaluation Tool v1")
         return page
 
@@ -27,17 +32,13 @@ def render_setup_page():
     with st.expander("Customize your persona", expanded=True):
         col_ctx1, col_ctx2 = st.columns(2)
         with col_ctx1:
-            role = st.text_area("Role / Background", placeholder="e.g. PhD in Chemical Engineering, 10 years in industry", height=100)
-            goal = st.text_area("Primary Goal", placeholder="e.g. License early-stage technologies for commercial development", height=100)
+            role = st.text_area("Role / Background", placeholder="e.g. PhD in Chemical Engineering, 10 years in industry", height=100, key="persona_role")
+            goal = st.text_area("Primary Goal", placeholder="e.g. License early-stage technologies for commercial development", height=100, key="persona_goal")
         with col_ctx2:
-            criteria = st.text_area("Specific Criteria", placeholder="e.g. Technology readiness: TRL 3-5, clear patent coverage with freedom to operate", height=100)
+            criteria = st.text_area("Specific Criteria", placeholder="e.g. Technology readiness: TRL 3-5, clear patent coverage with freedom to operate", height=100, key="persona_criteria")
             
     # Combine into a single context string for the AI
-    user_context = f"""
-    **Role:** {role}
-    **Goal:** {goal}
-    **Specific Criteria:** {criteria}
-    """
+    user_context = analysis.format_user_context(role, goal, criteria)
     st.session_state["user_context"] = user_context
     st.caption("This helps the tool provide more relevant feedback and focus on if the technology matches your specific needs.")
 
@@ -65,15 +66,26 @@ def render_setup_page():
         st.write("") 
         st.write("")
         analyze_btn = st.button("Evaluate IP", type="primary", use_container_width=True)
+        reevaluate_btn = st.button(
+            "Re-evaluate Loaded Patents",
+            disabled=not st.session_state.get("patent_key"),
+            help="Keeps the scraped patents and their technical digests; only the persona-specific evaluation runs again.",
+            use_container_width=True
+        )
+        st.checkbox(
+            "Full evaluation of every patent",
+            key="evaluate_members",
+            help="Runs the complete evaluation on each complementary patent too (in parallel) and bases the portfolio assessment on those."
+        )
         
-    return main_patent_input, complementary_input, analyze_btn
+    return main_patent_input, complementary_input, analyze_btn, reevaluate_btn
 
 import json
-from logic import analysis # Correct import path
 
-def render_results_page(evaluation, evaluation_portfolio=None):
+def render_results_page(evaluation, evaluation_portfolio=None, member_evaluations=None):
     """
     Renders the Analysis Results page with modular sections and chat.
+    `member_evaluations` ([(tab label, evaluation)] of the complementary patents) adds one tab each.
     """
     st.header("Evaluation Results")
     
@@ -90,6 +102,8 @@ def render_results_page(evaluation, evaluation_portfolio=None):
     
     if evaluation_portfolio:
         tab_labels.append("Portfolio Overview")
+    members = member_evaluations or []
+    tab_labels.extend(label for label, _ in members)
         
     tabs = st.tabs(tab_labels)
     
@@ -122,6 +136,32 @@ def render_results_page(evaluation, evaluation_portfolio=None):
     if evaluation_portfolio and len(tabs) > 3:
         with tabs[3]:
             st.markdown(evaluation_portfolio)
+            _render_overlap_clusters(st.session_state.get("portfolio_overlaps"))
+
+    # 5. One tab per fully evaluated complementary patent
+    for tab, (_, member_eval) in zip(tabs[len(tabs) - len(members):], members):
+        with tab:
+            st.markdown(member_eval)
+
+def _render_overlap_clusters(clusters):
+    """
+    Claim-overlap clusters found by near_duplicates for the current portfolio.
+    """
+    if clusters is None:
+        return
+    with st.expander(f"Claim Overlap ({len(clusters)} clusters)", expanded=False):
+        if not clusters:
+            st.caption("No significant claim overlap between these patents.")
+            return
+        st.dataframe(
+            [
+                {"Cluster": i, "Patent A": p["a"], "Patent B": p["b"], "Similarity": p["similarity"], "Relation": p["relation"]}
+                for i, cluster in enumerate(clusters, start=1)
+                for p in cluster["pairs"]
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
 
 def _render_section_chat(title, content):
     """
@@ -151,16 +191,31 @@ def _render_section_chat(title, content):
                 if api_key:
                     with st.spinner("Thinking..."):
                         section_context = f"Section: {title}\nContent: {content}"
-                        ans = analysis.chat_with_patent_context(q, [], section_context, api_key)
+                        ans = analysis.chat_with_patent_context(q, [], section_context, api_key, site="section_chat")
                         st.session_state[history_key].append({"role": "assistant", "content": ans})
                         st.rerun()
 
-def render_raw_data_page(patent_data_list):
+PATENTS_PER_PAGE = 20
+
+# (publication number, claim count) -> formatted first claims, so reruns don't rebuild them
+_claim_excerpts = {}
+_CLAIM_EXCERPTS_MAX = 4096
+
+def _claims_excerpt(patent_data):
+    claims = patent_data.get('claims', [])
+    cache_key = (patent_data.get('publication_number') or patent_data.get('url'), len(claims))
+    excerpt = _claim_excerpts.get(cache_key)
+    if excerpt is None:
+        excerpt = analysis.format_claims(claims[:5])
+        if len(_claim_excerpts) >= _CLAIM_EXCERPTS_MAX:
+            _claim_excerpts.clear()
+        _claim_excerpts[cache_key] = excerpt
+    return excerpt
+
+def render_patent_browser(patent_data_list, key="patent_browser"):
     """
-    Renders the raw scraped patent data.
-    Expects a LIST of patent data dicts.
+    Searchable, paginated list of patents. Only the selected patent's details are rendered.
     """
-    st.header("Raw Patent Data")
     if not patent_data_list:
         st.info("No patent data available.")
         return
@@ -169,27 +224,54 @@ def render_raw_data_page(patent_data_list):
     if not isinstance(patent_data_list, list):
         patent_data_list = [patent_data_list]
 
-    tabs = st.tabs([p.get('publication_number', f'Patent {i+1}') for i, p in enumerate(patent_data_list)])
+    col_search, col_page = st.columns([3, 1])
+    with col_search:
+        query = st.text_input("Search by number or title", key=f"{key}_query", placeholder="e.g. US9138726 or battery")
     
-    for i, tab in enumerate(tabs):
-        with tab:
-            patent_data = patent_data_list[i]
-            st.write(f"**Title:** {patent_data.get('title')}")
-            st.write(f"**Publication:** {patent_data.get('publication_number')}")
-            st.write(f"**Inventors:** {', '.join(patent_data.get('inventors', []))}")
-            
-            st.subheader("Abstract")
-            st.write(patent_data.get('abstract'))
-            
-            st.subheader("Claims (Excerpt)")
-            claims = patent_data.get('claims', [])
-            if claims and isinstance(claims[0], dict):
-                st.text("\n".join([f"{c['number']}: {c['text']}" for c in claims[:5]]))
-            else:
-                st.text("\n".join(claims[:5]))
-                
-            if patent_data.get('url'):
-                st.link_button("View on Google Patents", patent_data['url'])
+    matches = patent_data_list
+    if query:
+        q = query.strip().lower()
+        matches = [
+            p for p in patent_data_list
+            if q in f"{p.get('publication_number') or ''} {p.get('title') or ''}".lower()
+        ]
+    if not matches:
+        st.info("No patents match your search.")
+        return
+
+    page_count = (len(matches) + PATENTS_PER_PAGE - 1) // PATENTS_PER_PAGE
+    with col_page:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, key=f"{key}_page") if page_count > 1 else 1
+    
+    page_items = matches[(page - 1) * PATENTS_PER_PAGE:page * PATENTS_PER_PAGE]
+    selected = st.selectbox(
+        f"Patent ({len(matches)} of {len(patent_data_list)})",
+        range(len(page_items)),
+        format_func=lambda i: f"{page_items[i].get('publication_number', f'Patent {i+1}')} - {(page_items[i].get('title') or '')[:80]}",
+        key=f"{key}_selected_{page}"
+    )
+
+    patent_data = page_items[selected]
+    st.write(f"**Title:** {patent_data.get('title')}")
+    st.write(f"**Publication:** {patent_data.get('publication_number')}")
+    st.write(f"**Inventors:** {', '.join(patent_data.get('inventors', []))}")
+    
+    st.subheader("Abstract")
+    st.write(patent_data.get('abstract'))
+    
+    st.subheader("Claims (Excerpt)")
+    st.text(_claims_excerpt(patent_data))
+        
+    if patent_data.get('url'):
+        st.link_button("View on Google Patents", patent_data['url'])
+
+def render_raw_data_page(patent_data_list):
+    """
+    Renders the raw scraped patent data.
+    Expects a LIST of patent data dicts.
+    """
+    st.header("Raw Patent Data")
+    render_patent_browser(patent_data_list, key="raw_data_browser")
 
 def render_chat_interface(messages):
     """
@@ -0,0 +1,54 @@
+import streamlit as st
+from logic import patent_store
+
+def set_patents(main_data, portfolio_data=None):
+    """
+    Puts the scraped records into the shared store and keeps only their keys
+    (plus a lease pinning them) in this session.
+    """
+    records = ([main_data] if main_data else []) + list(portfolio_data or [])
+    # Stored and pinned in one step, so no other put can evict them before the lease exists
+    lease = patent_store.get_store().put_many(records)
+    main_key = lease.keys[0] if main_data else None
+    portfolio_keys = list(lease.keys[1:] if main_data else lease.keys) if portfolio_data else None
+
+    old_lease = st.session_state.get("patent_lease")
+    st.session_state["patent_lease"] = lease
+    if old_lease:
+        old_lease.release()
+
+    st.session_state["patent_key"] = main_key
+    st.session_state["portfolio_keys"] = portfolio_keys
+
+def clear_patents():
+    old_lease = st.session_state.get("patent_lease")
+    if old_lease:
+        old_lease.release()
+    st.session_state["patent_lease"] = None
+    st.session_state["patent_key"] = None
+    st.session_state["portfolio_keys"] = None
+
+def get_patent_data():
+    """
+    The main patent record for this session, or None.
+    """
+    return patent_store.get_store().get(st.session_state.get("patent_key"))
+
+def get_portfolio_data():
+    """
+    The portfolio records (main + complementary) for this session, or None if
+    there is no portfolio.
+    """
+    keys = st.session_state.get("portfolio_keys")
+    if not keys:
+        return None
+    store = patent_store.get_store()
+    records = [store.get(k) for k in keys]
+    return [r for r in records if r is not None]
+
+def get_patent_ids():
+    """
+    Publication numbers of the patents in this session (portfolio if any, else the main patent).
+    """
+    keys = st.session_state.get("portfolio_keys") or [st.session_state.get("patent_key")]
+    return [k for k in keys if k]
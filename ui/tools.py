@@ -1,15 +1,18 @@
 import streamlit as st
 from logic import analysis
+from logic import patent_store
+from ui import layout
+from ui import state
 
 def render_tools_page():
     st.header("Tools & Resources")
     
     # Check if we have patent data
-    patent_data = st.session_state.get("patent_data")
+    patent_data = state.get_patent_data()
     if not patent_data:
         st.warning("Please first search/scrape a patent in 'Analysis Setup' to use these tools effectively.")
     
-    tab_lookup, tab_raw = st.tabs(["Web Lookups", "Raw Patent Data"])
+    tab_lookup, tab_table, tab_raw = st.tabs(["Web Lookups", "Portfolio Table", "Raw Patent Data"])
     
     with tab_lookup:
         st.subheader("Targeted Web Lookups")
@@ -39,39 +42,204 @@ def render_tools_page():
             else:
                 st.caption("Enter a topic to generate links.")
 
+        st.divider()
+        st.subheader("Local Prior-Art Search")
+        st.markdown("Ranked matches from every patent scraped so far. Runs offline; CPC codes like `H01M 10/052` work as search terms.")
+        
+        from logic import prior_art_index
+        with st.spinner("Loading local patent index..."):
+            index = prior_art_index.get_index()
+        
+        col_q, col_k = st.columns([3, 1])
+        with col_q:
+            local_query = st.text_input("Search local corpus", value=search_topic, key="prior_art_query")
+        with col_k:
+            top_k = st.number_input("Results", min_value=5, max_value=100, value=10, step=5, key="prior_art_k")
+        
+        main_patent = state.get_patent_data()
+        if main_patent and st.checkbox("Rank by similarity to the main patent instead", key="prior_art_similar"):
+            matches = index.similar_to(main_patent, k=top_k)
+        elif local_query:
+            exclude = [main_patent.get('publication_number')] if main_patent else []
+            matches = index.search(local_query, k=top_k, exclude=exclude)
+        else:
+            matches = []
+        
+        st.caption(f"{len(index)} patents indexed.")
+        if matches:
+            st.dataframe(
+                [
+                    {
+                        "Patent": m["publication_number"],
+                        "Title": m["title"],
+                        "Score": m["score"],
+                        "Link": m["url"] or f"https://patents.google.com/patent/{m['publication_number']}"
+                    }
+                    for m in matches
+                ],
+                column_config={"Link": st.column_config.LinkColumn("Link", display_text="Open")},
+                use_container_width=True,
+                hide_index=True
+            )
+        elif local_query:
+            st.info("No local matches. The corpus grows with every patent you scrape.")
+
+        st.divider()
+        st.subheader("CPC Classification Lookup")
+        st.markdown("Find patents by CPC prefix (e.g. `H01M`, `H01M 10/*`, `H01M 10/05*`) or group them at any hierarchy level.")
+        
+        from logic import cpc_index
+        loaded_ids = state.get_patent_ids()
+        scope_options = (["Loaded patents"] if loaded_ids else []) + ["Local corpus"]
+        col_p, col_s, col_l = st.columns([2, 1, 1])
+        with col_p:
+            cpc_pattern = st.text_input("CPC prefix", key="cpc_pattern")
+        with col_s:
+            cpc_scope = st.selectbox("Scope", scope_options, key="cpc_scope")
+        with col_l:
+            cpc_level = st.selectbox("Group by", cpc_index.LEVELS, index=2, key="cpc_level")
+        
+        cpc_idx = cpc_index.get_index()
+        within = loaded_ids if cpc_scope == "Loaded patents" else None
+        if cpc_pattern:
+            cpc_matches = cpc_idx.query(cpc_pattern, within=within)
+            st.caption(f"{len(cpc_matches)} patents under {cpc_pattern}")
+            if cpc_matches:
+                st.write(", ".join(cpc_matches))
+        groups = cpc_idx.group(cpc_level, within=within)
+        if groups:
+            st.dataframe(
+                [
+                    {"CPC": label, "Description": cpc_idx.description(label), "Patents": len(ids), "Members": ", ".join(ids[:20])}
+                    for label, ids in sorted(groups.items(), key=lambda item: -len(item[1]))
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        if main_patent:
+            from logic import near_duplicates
+            with st.expander("Overlapping Patents & Likely Family Members", expanded=False):
+                st.caption("Patents in the local corpus whose claims substantially overlap the main patent's (MinHash estimate).")
+                with st.spinner("Loading claim signatures..."):
+                    overlaps = near_duplicates.get_detector().matches(main_patent)
+                if overlaps:
+                    st.dataframe(
+                        [
+                            {"Patent": m["publication_number"], "Title": m["title"], "Similarity": m["similarity"], "Relation": m["relation"]}
+                            for m in overlaps
+                        ],
+                        use_container_width=True,
+                        hide_index=True
+                    )
+                else:
+                    st.info("No overlapping patents found in the local corpus.")
+
+    with tab_table:
+        _render_portfolio_table()
+
     with tab_raw:
         st.subheader("Raw Patent Data")
         
         # Determine what to show
         # If portfolio exists, it acts as the master list
-        data_to_show = st.session_state.get("portfolio_data")
+        data_to_show = state.get_portfolio_data()
         if not data_to_show:
              # Fallback to single patent data
-             single = st.session_state.get("patent_data")
+             single = state.get_patent_data()
              if single:
                  data_to_show = [single]
         
-        if not data_to_show:
-            st.info("No patent data available.")
-        else:
-            tabs = st.tabs([p.get('publication_number', f'Patent {i+1}') for i, p in enumerate(data_to_show)])
-    
-            for i, tab in enumerate(tabs):
-                with tab:
-                    patent_data = data_to_show[i]
-                    st.write(f"**Title:** {patent_data.get('title')}")
-                    st.write(f"**Publication:** {patent_data.get('publication_number')}")
-                    st.write(f"**Inventors:** {', '.join(patent_data.get('inventors', []))}")
-                    
-                    st.subheader("Abstract")
-                    st.write(patent_data.get('abstract'))
-                    
-                    st.subheader("Claims (Excerpt)")
-                    claims = patent_data.get('claims', [])
-                    if claims and isinstance(claims[0], dict):
-                        st.text("\n".join([f"{c['number']}: {c['text']}" for c in claims[:5]]))
-                    else:
-                        st.text("\n".join(claims[:5]))
-                        
-                    if patent_data.get('url'):
-                        st.link_button("View on Google Patents", patent_data['url'])
+        layout.render_patent_browser(data_to_show, key="tools_patent_browser")
+
+        with st.expander("Shared Patent Store (server memory)", expanded=False):
+            report = patent_store.get_store().memory_report()
+            col_m1, col_m2, col_m3 = st.columns(3)
+            col_m1.metric("Records", report["entries"], help=f"{report['pinned']} in use by open sessions")
+            col_m2.metric("Memory", f"{report['total_bytes'] / 1e6:.1f} MB", help=f"Budget: {report['max_bytes'] / 1e6:.0f} MB")
+            col_m3.metric("Evictions", report["evictions"])
+            st.dataframe(
+                [
+                    {"Patent": i["key"], "Size (KB)": round(i["size_bytes"] / 1024, 1), "Sessions": i["refs"], "Reads": i["hits"]}
+                    for i in report["items"]
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _corpus_table(corpus_version):
+    from logic import corpus, portfolio_table
+    return portfolio_table.build_table(corpus.iter_records())
+
+def _loaded_table():
+    """
+    Table of the session's patents, rebuilt only when the loaded patents change.
+    """
+    from logic import portfolio_table
+
+    ids = tuple(state.get_patent_ids())
+    cached = st.session_state.get("portfolio_table")
+    if cached is None or cached[0] != ids:
+        records = state.get_portfolio_data() or [r for r in [state.get_patent_data()] if r]
+        cached = (ids, portfolio_table.build_table(records))
+        st.session_state["portfolio_table"] = cached
+    return cached[1]
+
+def _render_portfolio_table():
+    from logic import corpus
+
+    st.subheader("Portfolio Table")
+    st.markdown("Filter, sort and group patents by status, assignee, dates, country and CPC class.")
+
+    scope_options = (["Loaded patents"] if state.get_patent_ids() else []) + ["Local corpus"]
+    scope = st.radio("Source", scope_options, horizontal=True, key="table_scope")
+    if scope == "Local corpus":
+        with st.spinner("Loading local corpus..."):
+            table = _corpus_table(corpus.version())
+    else:
+        table = _loaded_table()
+    if not len(table):
+        st.info("No patents yet. The corpus grows with every patent you scrape.")
+        return
+
+    frame = table.frame
+    col_f1, col_f2, col_f3 = st.columns(3)
+    with col_f1:
+        statuses = st.multiselect("Status", sorted(frame["status"].dropna().unique()), key="table_status")
+        assignee = st.text_input("Assignee contains", key="table_assignee")
+    with col_f2:
+        countries = st.multiselect("Country", sorted(frame["country"].dropna().unique()), key="table_country")
+        cpc_prefix = st.text_input("CPC prefix", placeholder="H01M 10/", key="table_cpc")
+    with col_f3:
+        priority_before = st.date_input("Priority before", value=None, key="table_priority_before")
+        priority_after = st.date_input("Priority on/after", value=None, key="table_priority_after")
+
+    filtered = table.filter(
+        status=statuses, country=countries, assignee=assignee, cpc_prefix=cpc_prefix,
+        priority_before=priority_before, priority_after=priority_after
+    )
+
+    col_sort, col_dir, col_group = st.columns(3)
+    with col_sort:
+        sort_by = st.selectbox("Sort by", ["priority_date", "grant_date", "expiration_date", "claim_count", "publication_number", "assignee", "status"], key="table_sort")
+    with col_dir:
+        descending = st.checkbox("Descending", key="table_desc")
+    with col_group:
+        group_by = st.selectbox("Group by", ["(none)", "status", "country", "assignees", "cpc_subclasses"], key="table_group")
+
+    st.caption(f"{len(filtered)} of {len(table)} patents")
+    if group_by != "(none)":
+        st.dataframe(filtered.group(group_by), use_container_width=True, hide_index=True)
+
+    st.dataframe(
+        filtered.sort(sort_by, ascending=not descending).frame.drop(columns=["url"]),
+        use_container_width=True,
+        hide_index=True
+    )
+    st.download_button(
+        label="Export Table (CSV)",
+        data=filtered.to_csv(),
+        file_name="portfolio_table.csv",
+        mime="text/csv"
+    )
@@ -0,0 +1,71 @@
+import contextvars
+import os
+
+import streamlit as st
+
+from logic import usage
+
+# The sidebar container of the rerun in progress (filled in at the end of the script,
+# so the figures include the calls this rerun made)
+_panel = contextvars.ContextVar("usage_panel", default=None)
+
+def identity():
+    """
+    Stable id of the person behind this browser session, for the per-user daily budget: the
+    signed-in user's email if Streamlit authentication is configured, else the client IP
+    (the first X-Forwarded-For hop if IP_EVAL_TRUST_PROXY=1, i.e. behind a reverse proxy
+    that sets it). None if neither is known.
+    """
+    if st.user.get("is_logged_in") and st.user.get("email"):
+        return f"user:{st.user['email']}"
+    forwarded = st.context.headers.get("X-Forwarded-For") if os.environ.get("IP_EVAL_TRUST_PROXY") == "1" else None
+    ip = forwarded.split(",")[0].strip() if forwarded else st.context.ip_address
+    return f"ip:{ip}" if ip else None
+
+def begin():
+    """
+    Called from the sidebar: reserves the panel's place.
+    """
+    _panel.set(st.container())
+
+def finish():
+    """
+    Called at the very end of the script: renders this session's usage against its budgets.
+    """
+    panel = _panel.get()
+    _panel.set(None)
+    session_id = usage.current().get("session")
+    if panel is None or not session_id:
+        return
+
+    spent = usage.totals(session=session_id)
+    level, reason = usage.check_budget()
+    with panel:
+        with st.expander("Usage & Budget", expanded=level != "ok"):
+            st.caption(f"This session: {spent['calls']} model calls · {spent['tokens']:,} tokens · ~${spent['cost_usd']:.2f}")
+            for name, used, limit in usage.budget_status():
+                st.progress(min(used / limit, 1.0), text=f"{name.title()} budget: {used:,} / {int(limit):,} tokens")
+
+            if level == "refuse":
+                st.error(f"{reason} New evaluations and chat answers are paused.")
+            elif level == "degrade":
+                st.warning(f"{reason} Calls now use the faster fallback models with a shortened context.")
+
+            if spent["calls"]:
+                per_patent = [row for row in usage.breakdown("patent", session=session_id) if row["patent"] != "-"]
+                if per_patent:
+                    st.caption("Per patent")
+                    st.dataframe(
+                        [{"Patent": r["patent"], "Calls": r["calls"], "Tokens": r["tokens"], "Cost ($)": r["cost_usd"]} for r in per_patent],
+                        use_container_width=True,
+                        hide_index=True
+                    )
+                st.caption("Per step")
+                st.dataframe(
+                    [
+                        {"Step": r["site"], "Calls": r["calls"], "Tokens": r["tokens"], "Cost ($)": r["cost_usd"], "Avg (ms)": r["avg_latency_ms"], "Failed": r["failed_calls"]}
+                        for r in usage.breakdown("site", session=session_id)
+                    ],
+                    use_container_width=True,
+                    hide_index=True
+                )
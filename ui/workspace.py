@@ -0,0 +1,142 @@
+import time
+
+import streamlit as st
+
+from logic import corpus, patent_store, snapshots
+from ui import state
+
+# Plain session values saved as they are
+SNAPSHOT_KEYS = (
+    "user_context", "persona_role", "persona_goal", "persona_criteria",
+    "evaluation", "evaluation_portfolio", "member_evaluations", "portfolio_overlaps", "chat_history"
+)
+SECTION_CHAT_PREFIX = "chat_history_"
+
+def capture_workspace():
+    """
+    The session's evaluation workspace as plain data. Patents are stored as keys into the corpus.
+    """
+    workspace = {key: st.session_state.get(key) for key in SNAPSHOT_KEYS}
+    workspace["section_chats"] = {
+        key: value for key, value in st.session_state.items()
+        if str(key).startswith(SECTION_CHAT_PREFIX) and value
+    }
+    workspace["patent_key"] = st.session_state.get("patent_key")
+    workspace["portfolio_keys"] = st.session_state.get("portfolio_keys")
+
+    matrix = st.session_state.get("ip_score_matrix")
+    if matrix is not None and len(matrix):
+        workspace["ip_scores"] = {
+            "factor_codes": list(matrix.factor_codes),
+            "factor_categories": list(matrix.factor_categories),
+            "patent_ids": list(matrix.patent_ids),
+            "scores": matrix.scores.tolist(),
+            "imported_ids": sorted(matrix.imported_ids)
+        }
+    return workspace
+
+def _load_record(key):
+    # Still in server memory if another session uses it, otherwise from the disk corpus
+    return patent_store.get_store().get(key) or corpus.load_record(key)
+
+def restore_workspace(workspace):
+    """
+    Replaces the session's workspace. Returns the patent keys that could not be found.
+    """
+    missing = []
+    main_key = workspace.get("patent_key")
+    main_data = _load_record(main_key) if main_key else None
+    if main_key and main_data is None:
+        missing.append(main_key)
+
+    portfolio_data = None
+    if workspace.get("portfolio_keys"):
+        portfolio_data = []
+        for key in workspace["portfolio_keys"]:
+            record = main_data if key == main_key else _load_record(key)
+            if record is None:
+                if key not in missing:
+                    missing.append(key)
+            else:
+                portfolio_data.append(record)
+
+    if main_data:
+        state.set_patents(main_data, portfolio_data or None)
+    else:
+        state.clear_patents()
+
+    for key in [k for k in st.session_state if str(k).startswith(SECTION_CHAT_PREFIX)]:
+        del st.session_state[key]
+    for key in SNAPSHOT_KEYS:
+        st.session_state[key] = workspace.get(key)
+    # Widgets and the chat expect strings and a list rather than None
+    for key in ("persona_role", "persona_goal", "persona_criteria"):
+        st.session_state[key] = st.session_state[key] or ""
+    st.session_state["chat_history"] = st.session_state["chat_history"] or []
+    st.session_state.update(workspace.get("section_chats") or {})
+
+    scores = workspace.get("ip_scores")
+    if scores:
+        from logic.score_matrix import ScoreMatrix
+        st.session_state["ip_score_matrix"] = ScoreMatrix(
+            scores["factor_codes"], scores["factor_categories"], scores["patent_ids"], scores["scores"],
+            imported_ids=scores.get("imported_ids", ())
+        )
+    else:
+        st.session_state.pop("ip_score_matrix", None)
+    # Radio answers and derived tables belong to the old workspace
+    for key in [k for k in st.session_state if str(k).startswith("radio_")] + ["portfolio_table"]:
+        st.session_state.pop(key, None)
+    return missing
+
+def _default_name():
+    patent_key = st.session_state.get("patent_key")
+    patent = state.get_patent_data()
+    name = f"{patent_key} {patent.get('title') or ''}".strip() if patent else (patent_key or "Untitled")
+    role = (st.session_state.get("persona_role") or "").strip().splitlines()
+    return f"{name} ({role[0][:30]})" if role else name
+
+def render_snapshot_panel():
+    """
+    Sidebar panel to save the current evaluation and reopen saved ones.
+    """
+    with st.expander("Saved Evaluations", expanded=False):
+        can_save = bool(st.session_state.get("patent_key") or st.session_state.get("evaluation"))
+        name = st.text_input("Name", placeholder=_default_name() if can_save else "", key="snapshot_name", disabled=not can_save)
+        if st.button("Save Snapshot", disabled=not can_save, use_container_width=True):
+            metadata = snapshots.save_snapshot(capture_workspace(), name or _default_name(), state.get_patent_ids())
+            st.success(f"Saved ({metadata['size_bytes'] / 1024:.1f} KB).")
+
+        saved = snapshots.list_snapshots()
+        if not saved:
+            st.caption("No saved evaluations yet.")
+            return
+
+        labels = {
+            s["id"]: f"{s['name']} · {time.strftime('%Y-%m-%d %H:%M', time.localtime(s['created_at']))}"
+            for s in saved
+        }
+        selected = st.selectbox("Saved", list(labels), format_func=labels.get, key="snapshot_selected")
+        info = next(s for s in saved if s["id"] == selected)
+        st.caption(f"{len(info['patents'])} patents · {info['size_bytes'] / 1024:.1f} KB")
+
+        col_open, col_delete = st.columns(2)
+        if col_open.button("Open", use_container_width=True):
+            try:
+                _, workspace = snapshots.load_snapshot(selected)
+            except snapshots.SnapshotError as e:
+                st.error(str(e))
+                return
+            missing = restore_workspace(workspace)
+            if missing:
+                st.session_state["snapshot_warning"] = (
+                    f"Not in the local corpus any more: {', '.join(missing)}. Scrape them again to restore them."
+                )
+            st.rerun()
+        if col_delete.button("Delete", use_container_width=True):
+            snapshots.delete_snapshot(selected)
+            st.rerun()
+
+        warning = st.session_state.pop("snapshot_warning", None)
+        if warning:
+            st.warning(warning)